@@ -2,12 +2,26 @@
 
 This module exposes a small, stable API used by the FastAPI server. It
 constructs arkprts.Client with assets=False to avoid large asset
-downloads. Functions raise RuntimeError when arkprts or expected client
-APIs are missing so errors are visible during development.
+downloads. Public clients are kept warm per server region in `clients`
+so requests reuse connections and loaded network config. Functions raise
+RuntimeError when arkprts or expected client APIs are missing so errors
+are visible during development. Every upstream call goes through
+`call_upstream`, which checks the circuit breaker (circuit_breaker.py) and
+takes a rate-limit token (rate_limit.py) for its region and operation class.
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
 import logging
+import os
+
+from .cache import CoalescingCache, TTLCache, credential_key
+from .circuit_breaker import CircuitOpen, breakers, is_upstream_failure
+from .json_sections import extract
+from .player_directory import player_directory
+from .rate_limit import RateLimited, governor
+from .roster_index import RosterIndex
+from .search_cache import SEARCH_CACHE_MAXSIZE, normalize_nickname, search_cache
 
 try:
     import arkprts
@@ -24,9 +38,177 @@ def _require_client_class():
     return Client
 
 
-def _make_client():
-    Client = _require_client_class()
-    return Client(assets=False)
+# Regions whose clients are created (and network config loaded) at startup;
+# any other region gets a client lazily on first use.
+WARM_SERVERS = [s.strip() for s in os.getenv('ARK_WARM_SERVERS', 'en').split(',') if s.strip()]
+
+
+class ClientRegistry:
+    """One long-lived public arkprts.Client per server region.
+
+    Each client owns a NetworkSession (aiohttp connection pool plus loaded
+    domain/version config), so reusing it avoids new connections, TLS
+    handshakes and config fetches per request. aiohttp sessions are bound
+    to the event loop that created them, so the registry starts over if it
+    is used from a different loop (e.g. between TestClient instances).
+    """
+
+    def __init__(self):
+        self._clients: dict[str, object] = {}
+        self._loop = None
+
+    def get(self, server: str = 'en'):
+        """Return the shared client for `server`, creating it on first use."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not self._loop:
+            self._clients = {}
+            self._loop = loop
+
+        client = self._clients.get(server)
+        if client is None:
+            Client = _require_client_class()
+            client = Client(assets=False, server=server)
+            self._clients[server] = client
+        return client
+
+    def network(self, server: str = 'en'):
+        """Return the shared NetworkSession for `server`."""
+        return self.get(server).network
+
+    async def warm(self, servers: List[str]) -> None:
+        """Create clients for `servers` and preload their network config."""
+        logger = logging.getLogger('ak-chars.ark_client')
+        for server in servers:
+            try:
+                await asyncio.wait_for(self.get(server).network.load_network_config(server), timeout=10.0)
+            except Exception as e:
+                logger.warning('could not warm ark client for server=%s: %s', server, e)
+
+    async def aclose(self) -> None:
+        """Close every client's network session."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.network.close()
+            except Exception:
+                pass
+
+
+clients = ClientRegistry()
+
+
+def _make_client(server: str = 'en'):
+    return clients.get(server)
+
+
+# Upper bound on one upstream call; a timeout counts as a breaker failure
+UPSTREAM_TIMEOUT = float(os.getenv('ARK_UPSTREAM_TIMEOUT', '15'))
+
+
+async def call_upstream(server: str, operation: str, fn, /, *args, max_wait: float | None = None, **kwargs):
+    """Call `fn(*args, **kwargs)` behind the breaker and rate governor for (server, operation).
+
+    Raises CircuitOpen without calling upstream while the circuit is open,
+    and RateLimited if no token is available in time (within `max_wait`
+    seconds, if given, which is not passed on to `fn`). Awaitable results are
+    awaited (bounded by ARK_UPSTREAM_TIMEOUT) and the outcome is recorded on
+    the breaker.
+    """
+    breaker = breakers.check(server, operation)
+    try:
+        await governor.acquire(server, operation, max_wait)
+    except BaseException:
+        breaker.release()
+        raise
+    try:
+        result = fn(*args, **kwargs)
+        if hasattr(result, '__await__'):
+            result = await asyncio.wait_for(result, timeout=UPSTREAM_TIMEOUT)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
+            logging.getLogger('ak-chars.ark_client').warning(
+                'upstream %s failed for server=%s (%s, %d consecutive): %s',
+                operation, server, breaker.state, breaker.failures, e)
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+# Logged-in clients for /my/* calls, so repeat requests skip the login handshake
+SESSION_TTL = float(os.getenv('ARK_SESSION_TTL', '1800'))
+SESSION_MAXSIZE = int(os.getenv('ARK_SESSION_MAXSIZE', '256'))
+_sessions = TTLCache(maxsize=SESSION_MAXSIZE, ttl=SESSION_TTL)
+
+# Short-lived user-data snapshots; concurrent fetches for one account share a request
+USER_DATA_TTL = float(os.getenv('ARK_USER_DATA_TTL', '30'))
+USER_DATA_MAXSIZE = int(os.getenv('ARK_USER_DATA_MAXSIZE', '64'))
+_user_data = CoalescingCache(maxsize=USER_DATA_MAXSIZE, ttl=USER_DATA_TTL)
+
+# Last good snapshot per account, served while the upstream circuit is open
+STALE_USER_DATA_TTL = float(os.getenv('ARK_STALE_USER_DATA_TTL', '600'))
+_stale_user_data = TTLCache(maxsize=USER_DATA_MAXSIZE, ttl=STALE_USER_DATA_TTL)
+
+# Sections of `user` kept from get_raw_data, as dotted paths ('*' keeps everything).
+# The rest of the blob is dropped before it is cached or returned.
+USER_DATA_SECTIONS = os.getenv('ARK_USER_DATA_SECTIONS', 'troop.chars,status')
+
+
+def parse_sections(spec: str) -> Optional[List[tuple]]:
+    """Parse 'troop.chars,status' into key paths; None means keep everything."""
+    spec = spec.strip()
+    if not spec or spec == '*':
+        return None
+    return [tuple(section.strip().split('.')) for section in spec.split(',') if section.strip()]
+
+
+_USER_DATA_PATHS = parse_sections(USER_DATA_SECTIONS)
+
+
+def project_user_data(data: dict, paths: Optional[List[tuple]] = None) -> dict:
+    """Return `{'user': ...}` holding only the whitelisted sections of data['user'].
+
+    Missing sections are skipped. With `paths` None the data is returned as-is.
+    """
+    if paths is None or not isinstance(data, dict):
+        return data
+    return {'user': extract(data.get('user') or {}, paths)}
+
+
+def compact_user_data(data: dict) -> dict:
+    """Return `data` with `user.troop.chars` swapped for a RosterIndex view.
+
+    Cached snapshots then hold the roster column-wise instead of one dict
+    per operator; the view still reads like the raw `instId -> entry` map.
+    """
+    troop = data.get('user', {}).get('troop') if isinstance(data, dict) else None
+    if not isinstance(troop, dict) or not isinstance(troop.get('chars'), dict):
+        return data
+    chars = RosterIndex(troop['chars']).chars()
+    return {**data, 'user': {**data['user'], 'troop': {**troop, 'chars': chars}}}
+
+
+# Per-id fallback lookups in expand_player_ids run concurrently, bounded by these
+EXPAND_CONCURRENCY = int(os.getenv('ARK_EXPAND_CONCURRENCY', '8'))
+EXPAND_ID_TIMEOUT = float(os.getenv('ARK_EXPAND_ID_TIMEOUT', '5'))
+
+
+def user_data_cache_stats() -> dict:
+    """Return hit/miss/coalesced counters for the user-data snapshot cache."""
+    return _user_data.stats()
+
+
+def search_cache_stats() -> dict:
+    """Return hit/prefix-hit/miss counters for the player search cache."""
+    return {**search_cache.stats(), 'coalesced': _search_inflight.coalesced}
 
 
 async def get_characters(game_username: str) -> List[Dict]:
@@ -34,104 +216,196 @@ async def get_characters(game_username: str) -> List[Dict]:
 
     Each summary contains at least 'id' and 'name'.
     """
-    Client = _require_client_class()
-    client = Client(assets=False)
+    client = _make_client('en')
 
     # prefer the documented search API when available
     if hasattr(client, 'search_players'):
-        players = await client.search_players(game_username, server='en')
-        return [
-            {
-                'id': getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p),
-                'name': getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p),
-            }
-            for p in players
-        ]
+        players = await call_upstream('en', 'player', client.search_players, game_username, server='en')
+        return [_player_summary(p) for p in players]
 
     # fallback: attempt a generic players lookup
     if hasattr(client, 'get_players'):
-        players = await client.get_players([game_username], server='en')
-        return [
-            {
-                'id': getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p),
-                'name': getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p),
-            }
-            for p in players
-        ]
+        players = await call_upstream('en', 'player', client.get_players, [game_username], server='en')
+        return [_player_summary(p) for p in players]
 
     # no known API available
     raise RuntimeError('arkprts client does not expose a known player lookup API')
+
+
+_SINGLE_PLAYER_METHODS = ('get_player', 'get_player_by_id', 'get_player_by_uid', 'get_character', 'fetch_player')
+
+# Client class -> (single-player methods it exposes, whether it has search_players)
+_capabilities: dict[type, tuple[tuple[str, ...], bool]] = {}
+
+
+def _client_capabilities(client) -> tuple[tuple[str, ...], bool]:
+    """Probe the lookup methods a client exposes, once per client class."""
+    caps = _capabilities.get(type(client))
+    if caps is None:
+        methods = tuple(name for name in _SINGLE_PLAYER_METHODS if hasattr(client, name))
+        caps = (methods, hasattr(client, 'search_players'))
+        _capabilities[type(client)] = caps
+    return caps
+
+
+def _player_summary(p) -> dict:
+    """Return the {id, name, level} summary for an upstream player object."""
+    pid = getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p)
+    name = getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p)
+    level = getattr(p, 'level', None)
+    return {'id': str(pid), 'name': name, 'level': level}
+
+
+async def _lookup_single_player(client, pid_in: str, server: str, deadline: float | None = None):
+    """Resolve one player id via single-player methods, then search by id.
+
+    With a `deadline` (event loop time), each call waits for a rate token
+    only until then and raises RateLimited rather than running out the clock.
+    """
+    methods, can_search = _client_capabilities(client)
+    loop = asyncio.get_running_loop()
+
+    def remaining():
+        return None if deadline is None else max(0.0, deadline - loop.time())
+
+    # try common single-player methods
+    for fn_name in methods:
+        try:
+            maybe = await call_upstream(server, 'player', getattr(client, fn_name), pid_in,
+                                        max_wait=remaining(), server=server)
+            if maybe:
+                return maybe
+        except (CircuitOpen, RateLimited):
+            raise
+        except Exception:
+            continue
+
+    # fallback to search by id (some APIs allow searching by uid or nickname)
+    if can_search:
+        try:
+            res = await call_upstream(server, 'player', client.search_players, str(pid_in),
+                                      max_wait=remaining(), server=server, limit=1)
+            if res:
+                return res[0]
+        except (CircuitOpen, RateLimited):
+            raise
+        except Exception:
+            pass
+
+    return None
+
+
 async def expand_player_ids(ids: list[str], server: str = 'en') -> list[dict]:
     """Given a list of player ids, return compact player summaries.
 
-    Each summary is a dict with keys: id, name, level (if available).
+    Each summary is a dict with keys: id, name, level (if available), in the
+    order of `ids`. Ids with a fresh entry in `player_directory` are answered
+    from it; the rest go upstream, where ids missing from the bulk lookup are
+    resolved concurrently (at most EXPAND_CONCURRENCY at a time, each bounded
+    by EXPAND_ID_TIMEOUT seconds; an id that cannot get a rate token within
+    that raises RateLimited). Summaries upstream returned under another
+    id are appended at the end. Upstream results are recorded in the directory.
     """
+    order = list(dict.fromkeys(str(i) for i in ids))
+    found = await player_directory.get_many(server, order)
+    pending = [pid_in for pid_in in ids if str(pid_in) not in found]
+    extra: list[dict] = []
+    if pending:
+        fetched = await _expand_upstream(pending, server, set(found))
+        await player_directory.record(server, fetched)
+        requested = set(order)
+        for summary in fetched:
+            if summary['id'] in requested:
+                found.setdefault(summary['id'], summary)
+            else:
+                extra.append(summary)
+    return [found[pid] for pid in order if pid in found] + extra
+
+
+async def _expand_upstream(ids: list[str], server: str, resolved: set[str]) -> list[dict]:
     logger = logging.getLogger('ak-chars.ark_client')
-    client = _make_client()
+    client = _make_client(server)
     out: list[dict] = []
 
     # Try bulk lookup first if available
     if hasattr(client, 'get_players'):
         try:
-            players = await client.get_players(ids, server=server)
+            players = await call_upstream(server, 'player', client.get_players, ids, server=server)
             for p in players:
-                pid = getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p)
-                name = getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p)
-                level = getattr(p, 'level', None)
-                out.append({'id': str(pid), 'name': name, 'level': level})
+                summary = _player_summary(p)
+                out.append(summary)
+                resolved.add(summary['id'])
+        except (CircuitOpen, RateLimited):
+            raise
         except Exception as e:
             logger.debug('bulk get_players failed: %s', e)
 
     # Per-id fallbacks for clients that don't support bulk or returned partial results
-    for pid_in in ids:
-        if any(p.get('id') == str(pid_in) for p in out):
-            continue
+    missing = [pid_in for pid_in in dict.fromkeys(ids) if str(pid_in) not in resolved]
+    if not missing:
+        return out
 
-        found = None
-
-        # try common single-player methods
-        for fn_name in ('get_player', 'get_player_by_id', 'get_player_by_uid', 'get_character', 'fetch_player'):
-            if hasattr(client, fn_name):
-                try:
-                    fn = getattr(client, fn_name)
-                    maybe = fn(pid_in, server=server)
-                    if hasattr(maybe, '__await__'):
-                        maybe = await maybe
-                    if maybe:
-                        found = maybe
-                        break
-                except Exception:
-                    continue
-
-        # fallback to search by id (some APIs allow searching by uid or nickname)
-        if not found and hasattr(client, 'search_players'):
-            try:
-                res = await client.search_players(str(pid_in), server=server, limit=1)
-                if res:
-                    found = res[0]
-            except Exception:
-                pass
+    semaphore = asyncio.Semaphore(max(1, EXPAND_CONCURRENCY))
 
+    async def resolve(pid_in):
+        async with semaphore:
+            # a throttled lookup raises RateLimited (a 429) instead of timing out
+            # and quietly dropping its id
+            deadline = asyncio.get_running_loop().time() + EXPAND_ID_TIMEOUT
+            try:
+                return await asyncio.wait_for(_lookup_single_player(client, pid_in, server, deadline),
+                                              timeout=EXPAND_ID_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.debug('lookup for player %s timed out after %.1fs', pid_in, EXPAND_ID_TIMEOUT)
+                return None
+
+    # a TaskGroup cancels the other lookups as soon as one is refused
+    # (RateLimited/CircuitOpen), so they stop taking tokens and slots
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(resolve(pid_in)) for pid_in in missing]
+    except BaseExceptionGroup as e:
+        raise e.exceptions[0]
+
+    for found in (task.result() for task in tasks):
         if found:
-            p = found
-            pid = getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p)
-            name = getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p)
-            level = getattr(p, 'level', None)
-            out.append({'id': str(pid), 'name': name, 'level': level})
+            summary = _player_summary(found)
+            if summary['id'] not in resolved:
+                out.append(summary)
+                resolved.add(summary['id'])
 
     return out
 
 
+# Identical searches in flight at the same time share one upstream call
+_search_inflight = CoalescingCache(maxsize=SEARCH_CACHE_MAXSIZE, ttl=0)
+
+
 async def search_players(nickname: str, server: str = 'en', limit: int | None = 10) -> list[dict]:
-    """Search for players by nickname and return compact summaries."""
-    client = _make_client()
-    players = await client.search_players(nickname, server=server, limit=limit)
-    out = []
-    for p in players:
-        pid = getattr(p, 'uid', None) or getattr(p, 'id', None) or getattr(p, 'player_id', None) or str(p)
-        name = getattr(p, 'nickname', None) or getattr(p, 'nick', None) or getattr(p, 'name', None) or str(p)
-        level = getattr(p, 'level', None)
-        out.append({'id': pid, 'name': name, 'level': level})
+    """Search for players by nickname and return compact summaries.
+
+    Results come from `search_cache` when it can answer the query (the same
+    search, or a complete result for a prefix of it), then from
+    `player_directory` under the same rule, and are cached and recorded after
+    an upstream call otherwise. The returned list is shared and must not be
+    mutated.
+    """
+    cached = search_cache.get(server, nickname, limit)
+    if cached is not None:
+        return cached
+    known = await player_directory.search(server, nickname, limit)
+    if known is not None:
+        return known
+    key = (server, normalize_nickname(nickname), limit)
+    return await _search_inflight.get_or_load(key, lambda: _search_upstream(nickname, server, limit))
+
+
+async def _search_upstream(nickname: str, server: str, limit: int | None) -> list[dict]:
+    client = _make_client(server)
+    players = await call_upstream(server, 'player', client.search_players, nickname, server=server, limit=limit)
+    out = [_player_summary(p) for p in players]
+    search_cache.set(server, nickname, limit, out)
+    await player_directory.record(server, out, query=nickname, limit=limit)
     return out
 
 
@@ -149,7 +423,7 @@ async def send_game_auth_code(email: str, server: str = 'en') -> bool:
 
     # Create auth instance for the server
     auth = YostarAuth(server)
-    await auth.send_email_code(email)
+    await call_upstream(server, 'auth_code', auth.send_email_code, email)
     return True
 
 
@@ -167,32 +441,42 @@ async def get_game_token_from_code(email: str, code: str, server: str = 'en') ->
 
     # Create auth instance and get token
     auth = YostarAuth(server)
-    channel_uid, token = await auth.get_token_from_email_code(email=email, code=code)
+    channel_uid, token = await call_upstream(server, 'token', auth.get_token_from_email_code, email=email, code=code)
     return channel_uid, token
 
 
-async def get_user_data(channel_uid: str, yostar_token: str, server: str = 'en') -> dict:
-    """Get authenticated user's full game data including complete operator roster.
-    
-    Requires game credentials (channelUid and yostar token).
-    Returns raw game data with all operators, inventory, and account info.
+async def _get_session_client(channel_uid: str, yostar_token: str, server: str):
+    """Return a logged-in Client for the credentials, reusing a cached session.
+
+    Sessions are keyed by a hash of (channel_uid, yostar_token, server) and
+    share the region's NetworkSession from `clients`.
     """
+    key = credential_key(channel_uid, yostar_token, server)
+    network = clients.network(server)
+    client = _sessions.get(key)
+    if client is not None and client.network is network:
+        return client
+
     Client = _require_client_class()
-    
+
     # Check if YostarAuth is available
     YostarAuth = getattr(arkprts, 'YostarAuth', None)
     if YostarAuth is None:
         raise RuntimeError('arkprts.YostarAuth not found - authentication not supported')
-    
+
     # Create authenticated client (from_token is async!)
-    auth = await YostarAuth.from_token(server=server, channel_uid=channel_uid, token=yostar_token)
+    auth = await call_upstream(server, 'token', YostarAuth.from_token,
+                               server=server, channel_uid=channel_uid, token=yostar_token, network=network)
     client = Client(auth=auth, server=server, assets=False)
-    
-    # Get full user data
+    _sessions.set(key, client)
+    return client
+
+
+async def _fetch_user_data(client, server: str) -> dict:
     if hasattr(client, 'get_raw_data'):
-        return await client.get_raw_data()
+        return await call_upstream(server, 'data', client.get_raw_data)
     elif hasattr(client, 'get_data'):
-        data = await client.get_data()
+        data = await call_upstream(server, 'data', client.get_data)
         # Convert model to dict if needed
         if hasattr(data, 'dict'):
             return data.dict()
@@ -201,3 +485,52 @@ async def get_user_data(channel_uid: str, yostar_token: str, server: str = 'en')
         return data
     else:
         raise RuntimeError('arkprts client does not expose get_data or get_raw_data')
+
+
+async def get_user_data(channel_uid: str, yostar_token: str, server: str = 'en') -> dict:
+    """Get authenticated user's full game data including complete operator roster.
+
+    Requires game credentials (channelUid and yostar token).
+    Returns raw game data trimmed to the ARK_USER_DATA_SECTIONS of `user`
+    (by default `troop.chars` and `status`), with `troop.chars` held as a
+    read-only RosterIndex view (see `compact_user_data`).
+    Results are cached for ARK_USER_DATA_TTL seconds and concurrent calls for
+    the same credentials share one upstream fetch, so the returned dict is
+    shared and must not be mutated. While the upstream circuit is open the
+    last snapshot (up to ARK_STALE_USER_DATA_TTL seconds old) is returned
+    instead, if there is one.
+    """
+    key = credential_key(channel_uid, yostar_token, server)
+    try:
+        return await _user_data.get_or_load(key, lambda: _load_user_data(channel_uid, yostar_token, server))
+    except CircuitOpen as e:
+        stale = _stale_user_data.get(key)
+        if stale is None:
+            raise
+        logging.getLogger('ak-chars.ark_client').warning('serving stale user data for server=%s: %s', server, e)
+        return stale
+
+
+async def _load_user_data(channel_uid: str, yostar_token: str, server: str) -> dict:
+    """Fetch user data upstream, reusing a logged-in session when possible.
+
+    If a cached session fails it is dropped and the call is retried once
+    with a fresh login (but not when the call was refused locally by the
+    rate governor or an open circuit).
+    """
+    key = credential_key(channel_uid, yostar_token, server)
+    previous = _sessions.get(key)
+    client = await _get_session_client(channel_uid, yostar_token, server)
+    try:
+        data = await _fetch_user_data(client, server)
+    except (CircuitOpen, RateLimited):
+        raise
+    except Exception:
+        _sessions.pop(key)
+        if client is not previous:
+            raise
+        client = await _get_session_client(channel_uid, yostar_token, server)
+        data = await _fetch_user_data(client, server)
+    data = compact_user_data(project_user_data(data, _USER_DATA_PATHS))
+    _stale_user_data.set(key, data)
+    return data
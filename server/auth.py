@@ -1,29 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, EmailStr
 import os
-import json
-from pathlib import Path
 from dotenv import load_dotenv
 
 import logging
 from .ark_client import get_user_data, send_game_auth_code, get_game_token_from_code
+from .fixture_store import fixture_store
+from .circuit_breaker import CircuitOpen
+from .rate_limit import RateLimited
+from .responses import FastJSONResponse, body_response, encoded_bodies, fixture_responses
 
 logger = logging.getLogger('ak-chars.auth')
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 USE_FIXTURES = os.getenv('USE_FIXTURES', 'true').lower() == 'true'
 
 
-def load_fixture_data():
-    """Load user data from fixture file for development."""
-    fixture_path = Path(__file__).parent / 'tests' / 'user_data_response.json'
-    with open(fixture_path, 'r') as f:
-        return json.load(f)
-
-
 class MyRosterRequest(BaseModel):
     channel_uid: str
     yostar_token: str
@@ -48,7 +43,7 @@ class GameTokenRequest(BaseModel):
 
 
 @router.post('/my/roster')
-async def my_roster(req: MyRosterRequest):
+async def my_roster(req: MyRosterRequest, request: Request):
     """Get the authenticated user's operator roster.
     
     Returns only user.troop.chars - the complete operator roster with stats.
@@ -58,22 +53,26 @@ async def my_roster(req: MyRosterRequest):
     """
     try:
         if USE_FIXTURES:
-            fixture_data = load_fixture_data()
-            chars = fixture_data.get('data', {}).get('user', {}).get('troop', {}).get('chars', {})
+            chars = fixture_store.chars()
             logger.info('Returning fixture roster data (%d operators)', len(chars))
-            return {'ok': True, 'chars': chars}
-        
+            body = fixture_responses.get(fixture_store.version, ('my/roster',), lambda: {'ok': True, 'chars': chars})
+            return body_response(request, body)
+
         data = await get_user_data(req.channel_uid, req.yostar_token, req.server)
         chars = data.get('user', {}).get('troop', {}).get('chars', {})
         logger.info('Fetched roster for server=%s (%d operators)', req.server, len(chars))
-        return {'ok': True, 'chars': chars}
+        # the same snapshot is served from cache, so is its encoded (and compressed) body
+        body = encoded_bodies.get(chars, 'my/roster', lambda: {'ok': True, 'chars': chars})
+        return body_response(request, body)
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         logger.exception('Error fetching roster: %s', e)
         raise HTTPException(status_code=500, detail=f'Error fetching roster: {e}')
 
 
 @router.post('/my/status')
-async def my_status(req: MyStatusRequest):
+async def my_status(req: MyStatusRequest, request: Request):
     """Get the authenticated user's status information.
     
     Returns only user.status - player status including level, AP, nickName, etc.
@@ -83,15 +82,16 @@ async def my_status(req: MyStatusRequest):
     """
     try:
         if USE_FIXTURES:
-            fixture_data = load_fixture_data()
-            status = fixture_data.get('data', {}).get('user', {}).get('status', {})
+            status = fixture_store.status()
             logger.info('Returning fixture status data')
-            return {'ok': True, 'status': status}
-        
-        data = await get_user_data(req.channel_uid, req.yostar_token, req.server)
-        status = data.get('user', {}).get('status', {})
-        logger.info('Fetched user status for server=%s', req.server)
-        return {'ok': True, 'status': status}
+        else:
+            data = await get_user_data(req.channel_uid, req.yostar_token, req.server)
+            status = data.get('user', {}).get('status', {})
+            logger.info('Fetched user status for server=%s', req.server)
+        body = encoded_bodies.get(status, 'my/status', lambda: {'ok': True, 'status': status})
+        return body_response(request, body)
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         logger.exception('Error fetching user status: %s', e)
         raise HTTPException(status_code=500, detail=f'Error fetching user status: {e}')
@@ -108,6 +108,8 @@ async def game_code(payload: GameCodeRequest):
         await send_game_auth_code(payload.email, payload.server)
         logger.info('Sent game auth code for server %s', payload.server)
         return {'ok': True, 'message': 'Code sent to email'}
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         logger.exception('Error sending game auth code: %s', e)
         # Preserve error structure from arkprts for better error handling
@@ -151,6 +153,8 @@ async def game_token(payload: GameTokenRequest):
             'yostar_token': token,
             'server': payload.server
         }
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         logger.exception('Error getting game token: %s', e)
         raise HTTPException(status_code=400, detail=f'Error getting token: {e}')
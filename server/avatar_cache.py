@@ -0,0 +1,201 @@
+"""Async avatar fetching with a size-capped on-disk cache.
+
+Avatar images are stored under AVATAR_CACHE_DIR keyed by a hash of the
+avatar id (or source URL), with a small JSON sidecar holding the content
+type, a content-hash ETag and the Last-Modified time. The least recently
+served files are evicted once the cache grows past AVATAR_CACHE_MAX_BYTES.
+`player_avatars` remembers which cache key served each player for
+AVATAR_PLAYER_TTL seconds, so repeat requests (and 304 revalidations) for
+a player are answered from disk without an upstream player lookup.
+Disk I/O runs in a worker thread so the event loop is never blocked.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from fastapi import Request, Response
+
+from .cache import TTLCache
+from .responses import etag_matches
+
+logger = logging.getLogger('ak-chars.avatar_cache')
+
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'ak-chars-avatars')
+AVATAR_CACHE_MAX_BYTES = int(os.getenv('AVATAR_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+AVATAR_FETCH_TIMEOUT = float(os.getenv('AVATAR_FETCH_TIMEOUT', '10'))
+AVATAR_PLAYER_TTL = float(os.getenv('AVATAR_PLAYER_TTL', '3600'))
+AVATAR_PLAYER_MAXSIZE = int(os.getenv('AVATAR_PLAYER_MAXSIZE', '4096'))
+
+
+@dataclass(frozen=True)
+class AvatarImage:
+    content: bytes
+    content_type: str
+    etag: str
+    last_modified: str
+
+
+def make_image(content: bytes, content_type: Optional[str] = None, last_modified: Optional[float] = None) -> AvatarImage:
+    """Wrap raw image bytes with a content-hash ETag."""
+    return AvatarImage(
+        content=bytes(content),
+        content_type=content_type or 'image/png',
+        etag='"%s"' % hashlib.sha256(content).hexdigest(),
+        last_modified=formatdate(last_modified or time.time(), usegmt=True),
+    )
+
+
+class AvatarDiskCache:
+    """LRU-by-size cache of avatar images on disk."""
+
+    def __init__(self, directory: str = AVATAR_CACHE_DIR, max_bytes: int = AVATAR_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # file stem -> size on disk (image + sidecar), least recently used first
+        self._index: Optional[OrderedDict[str, int]] = None
+        self._total = 0
+
+    async def get(self, key: str) -> Optional[AvatarImage]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, image: AvatarImage) -> None:
+        try:
+            await asyncio.to_thread(self._put, key, image)
+        except OSError as e:
+            logger.warning('could not cache avatar %s: %s', key, e)
+
+    @staticmethod
+    def _stem(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _load_index(self) -> None:
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        self._total = 0
+        if not self.directory.is_dir():
+            return
+        entries = []
+        for meta_path in self.directory.glob('*.json'):
+            img_path = meta_path.with_suffix('.img')
+            try:
+                size = meta_path.stat().st_size + img_path.stat().st_size
+                entries.append((img_path.stat().st_mtime, meta_path.stem, size))
+            except OSError:
+                continue
+        for _, stem, size in sorted(entries):
+            self._index[stem] = size
+            self._total += size
+
+    def _get(self, key: str) -> Optional[AvatarImage]:
+        stem = self._stem(key)
+        with self._lock:
+            self._load_index()
+            if stem not in self._index:
+                return None
+            img_path = self.directory / f'{stem}.img'
+            try:
+                meta = json.loads((self.directory / f'{stem}.json').read_text())
+                content = img_path.read_bytes()
+                # mtime tracks recency so LRU order survives restarts
+                os.utime(img_path)
+            except (OSError, ValueError):
+                self._total -= self._index.pop(stem)
+                return None
+            self._index.move_to_end(stem)
+        return AvatarImage(content=content, content_type=meta['content_type'], etag=meta['etag'], last_modified=meta['last_modified'])
+
+    def _put(self, key: str, image: AvatarImage) -> None:
+        stem = self._stem(key)
+        meta = json.dumps({'content_type': image.content_type, 'etag': image.etag, 'last_modified': image.last_modified}).encode('utf-8')
+        with self._lock:
+            self._load_index()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for suffix, data in (('.img', image.content), ('.json', meta)):
+                fd, tmp = tempfile.mkstemp(dir=self.directory)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, self.directory / f'{stem}{suffix}')
+            self._total -= self._index.pop(stem, 0)
+            self._index[stem] = len(image.content) + len(meta)
+            self._total += self._index[stem]
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._index) > 1:
+            stem, size = self._index.popitem(last=False)
+            self._total -= size
+            for suffix in ('.img', '.json'):
+                try:
+                    (self.directory / f'{stem}{suffix}').unlink()
+                except OSError:
+                    pass
+
+
+avatar_cache = AvatarDiskCache()
+
+# (server, player id) -> avatar_cache key of the image last served for them
+player_avatars = TTLCache(maxsize=AVATAR_PLAYER_MAXSIZE, ttl=AVATAR_PLAYER_TTL)
+
+_http: Optional[httpx.AsyncClient] = None
+_http_loop = None
+
+
+def http_client() -> httpx.AsyncClient:
+    """Return the pooled AsyncClient for avatar downloads (one per event loop)."""
+    global _http, _http_loop
+    loop = asyncio.get_running_loop()
+    if _http is None or _http_loop is not loop:
+        _http = httpx.AsyncClient(timeout=AVATAR_FETCH_TIMEOUT, follow_redirects=True)
+        _http_loop = loop
+    return _http
+
+
+async def aclose() -> None:
+    global _http
+    client, _http = _http, None
+    if client is not None:
+        await client.aclose()
+
+
+async def fetch_avatar(url: str, key: Optional[str] = None) -> Optional[AvatarImage]:
+    """Return the image at `url`, from the disk cache when present.
+
+    `key` defaults to the URL; pass the avatar id when known so the same
+    image is shared between players.
+    """
+    key = key or url
+    cached = await avatar_cache.get(key)
+    if cached is not None:
+        return cached
+    r = await http_client().get(url)
+    if r.status_code != 200:
+        return None
+    image = make_image(r.content, r.headers.get('content-type'))
+    await avatar_cache.put(key, image)
+    return image
+
+
+def avatar_response(request: Request, image: AvatarImage) -> Response:
+    """Build an image response, answering 304 when If-None-Match matches."""
+    headers = {
+        'ETag': image.etag,
+        'Last-Modified': image.last_modified,
+        'Cache-Control': 'public, max-age=86400',
+    }
+    if etag_matches(request, image.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.content, media_type=image.content_type, headers=headers)
@@ -0,0 +1,131 @@
+"""Small in-process caches shared by the server modules."""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def credential_key(*parts: str) -> str:
+    """Return a stable hash for a credential tuple.
+
+    Used as a cache key so raw tokens are never kept as dict keys or logged.
+    """
+    return hashlib.sha256('\0'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """Bounded mapping with per-entry expiry and least-recently-used eviction.
+
+    Not thread-safe; intended for use from the event loop.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the live value for `key` (marking it recently used) or `default`."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires <= self._clock():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store `value`, evicting expired then least-recently-used entries."""
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._purge_expired()
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove `key` and return its value (expired or not) or `default`."""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _purge_expired(self) -> None:
+        now = self._clock()
+        for key in [k for k, (expires, _) in self._data.items() if expires <= now]:
+            del self._data[key]
+
+
+class CoalescingCache:
+    """TTL cache whose misses are loaded once per key (single-flight).
+
+    Concurrent callers for a key that is being loaded await the same
+    in-flight load instead of starting their own. Failed loads are not
+    cached. A `ttl` of 0 disables caching but keeps coalescing. Cached
+    values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, loading it with `loader` on a miss."""
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        # shield so one caller going away doesn't cancel the load for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            if self._cache.ttl > 0:
+                self._cache.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'size': len(self._cache),
+            'ttl': self._cache.ttl,
+        }
+
+
+_MISSING = object()
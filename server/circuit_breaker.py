@@ -0,0 +1,157 @@
+"""Circuit breakers for upstream Yostar/arkprts calls.
+
+Without a breaker, every request during an upstream outage waits for its
+own timeout and ties up a worker slot. Each (server region, operation
+class) gets a breaker (the operation classes match rate_limit.py):
+
+- closed: calls go through; ARK_BREAKER_THRESHOLD consecutive upstream
+  failures open the circuit.
+- open: calls fail at once with `CircuitOpen` for ARK_BREAKER_RESET seconds.
+- half-open: after that, a single probe call is let through. Success closes
+  the circuit; failure opens it for another ARK_BREAKER_RESET seconds. Other
+  callers keep failing fast while the probe is in flight.
+
+Only errors that mean upstream is unhealthy count as failures (timeouts,
+connection errors, 5xx answers, HTML error pages and Yostar's 100302
+"too many requests"). An upstream error about the request itself, such as
+an unknown player or a bad code, shows the service is up and counts as a
+success.
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Callable
+
+from fastapi import HTTPException
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+try:
+    from arkprts import errors as ark_errors
+except Exception:
+    ark_errors = None
+
+ARK_BREAKER_THRESHOLD = int(os.getenv('ARK_BREAKER_THRESHOLD', '5'))
+ARK_BREAKER_RESET = float(os.getenv('ARK_BREAKER_RESET', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling upstream while a circuit is open."""
+
+    def __init__(self, server: str, operation: str, retry_after: float):
+        super().__init__(f'upstream {operation} on server={server} is failing; retry in {retry_after:.1f}s')
+        self.server = server
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+def service_unavailable(e: CircuitOpen) -> HTTPException:
+    """HTTP 503 for a CircuitOpen error, with a Retry-After header."""
+    return HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))})
+
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """Whether an error from an upstream call means upstream is unhealthy."""
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if aiohttp is not None and isinstance(e, aiohttp.ClientError):
+        return True
+    if ark_errors is not None and isinstance(e, ark_errors.InvalidContentTypeError):
+        return True
+    status = getattr(e, 'status', None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return '100302' in str(e)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, threshold: int = ARK_BREAKER_THRESHOLD, reset_timeout: float = ARK_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; a True in half-open state claims the probe."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self) -> None:
+        """Give back a claimed probe whose call never reached upstream."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self.state = OPEN
+            self._opened_at = self._clock()
+        self._probing = False
+
+
+class CircuitBreakers:
+    """Circuit breakers per (server region, operation class), created on first use."""
+
+    def __init__(self, threshold: int = ARK_BREAKER_THRESHOLD, reset_timeout: float = ARK_BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, server: str, operation: str) -> CircuitBreaker:
+        key = (server, operation)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.threshold, self.reset_timeout, clock=self._clock)
+        return breaker
+
+    def check(self, server: str, operation: str) -> CircuitBreaker:
+        """Return the breaker for a call about to be made, or raise CircuitOpen."""
+        breaker = self.get(server, operation)
+        if not breaker.allow():
+            # retry_after() is 0 while a half-open probe is in flight
+            raise CircuitOpen(server, operation, breaker.retry_after() or 1.0)
+        return breaker
+
+    def stats(self) -> dict:
+        """Return the state and consecutive failure count of every breaker."""
+        return {
+            f'{server}/{op}': {'state': b.state, 'failures': b.failures}
+            for (server, op), b in self._breakers.items()
+        }
+
+
+breakers = CircuitBreakers()
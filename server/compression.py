@@ -0,0 +1,148 @@
+"""Content-Encoding negotiation and precompressed response bodies.
+
+`EncodedBody` wraps JSON bytes that are cached (fixture responses, user
+data snapshots) and memoizes their gzip/brotli variants, so a cached
+payload is compressed once and then sent many times. `CompressionMiddleware`
+compresses other large JSON responses on the fly for selected paths
+(GraphQL, raw player data). Brotli is used when the `brotli` package is
+installed and the client accepts it; gzip otherwise.
+"""
+
+import gzip
+import os
+from typing import Optional
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+# Routes whose uncached responses are compressed by the middleware
+COMPRESSION_PATHS = tuple(
+    p.strip() for p in os.getenv('COMPRESSION_PATHS', '/graphql,/players/raw').split(',') if p.strip()
+)
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Encodings we can produce, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick an encoding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best = None
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=COMPRESSION_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(content, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    raise ValueError(f'unsupported encoding {encoding!r}')
+
+
+class EncodedBody:
+    """JSON bytes with an optional ETag and lazily built compressed variants."""
+
+    __slots__ = ('content', 'etag', '_variants')
+
+    def __init__(self, content: bytes, etag: Optional[str] = None):
+        self.content = content
+        self.etag = etag
+        self._variants: dict[str, bytes] = {}
+
+    def choose(self, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+        """Return `(bytes, encoding)` for the client; encoding is None for identity."""
+        if len(self.content) < COMPRESSION_MIN_SIZE:
+            return self.content, None
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return self.content, None
+        variant = self._variants.get(encoding)
+        if variant is None:
+            variant = self._variants[encoding] = compress(self.content, encoding)
+        return variant, encoding
+
+    def variant_etag(self, encoding: Optional[str]) -> Optional[str]:
+        """ETag of one representation: the base tag with an encoding suffix."""
+        if self.etag is None or encoding is None:
+            return self.etag
+        return self.etag[:-1] + '-' + encoding + '"'
+
+
+class CompressionMiddleware:
+    """Compress large responses on the fly for the configured path prefixes.
+
+    Responses that already carry a Content-Encoding (e.g. precompressed
+    cached bodies) or are streamed in several chunks pass through as-is.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...] = COMPRESSION_PATHS, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.paths = paths
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get('headers', []))
+        encoding = negotiate(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            response_headers = start.get('headers', [])
+            body = message.get('body', b'')
+            if (
+                message.get('more_body')
+                or len(body) < self.minimum_size
+                or any(k.lower() == b'content-encoding' for k, _ in response_headers)
+            ):
+                await send(start)
+                start = None
+                await send(message)
+                return
+            body = compress(body, encoding)
+            response_headers = [(k, v) for k, v in response_headers if k.lower() != b'content-length']
+            response_headers += [
+                (b'content-encoding', encoding.encode()),
+                (b'content-length', str(len(body)).encode()),
+                (b'vary', b'Accept-Encoding'),
+            ]
+            await send({**start, 'headers': response_headers})
+            start = None
+            await send({**message, 'body': body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,101 @@
+"""Process-wide store for the development fixture.
+
+The fixture (`tests/user_data_response.json`) is a ~3 MB JSON document.
+It is parsed once, on startup or first use, and re-parsed only when the
+file's mtime changes. Only `user.troop.chars` and `user.status` are kept
+(see `json_sections`), and the chars are held column-wise in a
+`RosterIndex` rather than as one dict per operator. Callers get read-only
+views of the user sections they need instead of re-opening and re-parsing
+the file per request.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+from .json_sections import load_sections
+from .roster_index import RosterIndex
+
+logger = logging.getLogger('ak-chars.fixture_store')
+
+FIXTURE_PATH = Path(__file__).parent / 'tests' / 'user_data_response.json'
+
+# The only parts of the fixture the app reads; the rest is never materialized
+SECTIONS = (('data', 'user', 'troop', 'chars'), ('data', 'user', 'status'))
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+class FixtureStore:
+    """Parsed fixture cache that reloads when the file changes on disk.
+
+    `chars()` is the roster's `RosterChars` view and `status()` a
+    `MappingProxyType` over the parsed status. The views are shared by every
+    request, so callers must treat nested data (skills, equip) as read-only
+    too.
+    """
+
+    def __init__(self, path: Path = FIXTURE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime: int | None = None
+        self._version = 0
+        self._user: Mapping = _EMPTY
+        self._chars: Mapping = _EMPTY
+        self._status: Mapping = _EMPTY
+        self._roster = RosterIndex({})
+
+    @property
+    def version(self) -> int:
+        """Counter bumped on every (re)load; lets callers key derived data."""
+        self._refresh()
+        return self._version
+
+    def load(self) -> None:
+        """Parse the fixture now (used to warm the store at startup)."""
+        self._refresh()
+
+    def user(self) -> Mapping:
+        """Return a read-only view of `data.user` (troop.chars and status only)."""
+        self._refresh()
+        return self._user
+
+    def chars(self) -> Mapping:
+        """Return a read-only view of `data.user.troop.chars`."""
+        self._refresh()
+        return self._chars
+
+    def status(self) -> Mapping:
+        """Return a read-only view of `data.user.status`."""
+        self._refresh()
+        return self._status
+
+    def roster(self) -> RosterIndex:
+        """Return the RosterIndex for the current chars, built once per load."""
+        self._refresh()
+        return self._roster
+
+    def _refresh(self) -> None:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            data = load_sections(self.path, SECTIONS)
+            user = data.get('data', {}).get('user', {})
+            # the raw operator dicts are dropped once the roster is built
+            roster = RosterIndex(user.get('troop', {}).get('chars', {}))
+            self._roster = roster
+            self._chars = roster.chars()
+            self._status = MappingProxyType(user.get('status', {}))
+            self._user = MappingProxyType({**user, 'troop': MappingProxyType({'chars': self._chars})})
+            self._mtime = mtime
+            self._version += 1
+            logger.info('Loaded fixture %s (%d operators)', self.path.name, len(self._chars))
+
+
+fixture_store = FixtureStore()
@@ -1,23 +1,37 @@
 """REST endpoints for fixture data (development/testing)."""
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
-import json
-from pathlib import Path
 
+from .fixture_store import fixture_store
+from .responses import FastJSONResponse, body_response, fixture_responses
 
-router = APIRouter()
 
+router = APIRouter(default_response_class=FastJSONResponse)
 
-def load_fixture_data():
-    """Load user data from fixture file for development."""
-    fixture_path = Path(__file__).parent / 'tests' / 'user_data_response.json'
-    with open(fixture_path, 'r') as f:
-        return json.load(f)
+
+def _operator_dict(char_data) -> dict:
+    """Shape a raw `troop.chars` entry as an operator response object."""
+    return {
+        'charId': char_data.get('charId', ''),
+        'level': char_data.get('level', 0),
+        'evolvePhase': char_data.get('evolvePhase', 0),
+        'elite': char_data.get('evolvePhase', 0),  # alias
+        'potentialRank': char_data.get('potentialRank', 0),
+        'potential': char_data.get('potentialRank', 0),  # alias
+        'mainSkillLvl': char_data.get('mainSkillLvl', 0),
+        'favorPoint': char_data.get('favorPoint', 0),
+        'skin': char_data.get('skin'),
+        'defaultSkillIndex': char_data.get('defaultSkillIndex', -1),
+        'gainTime': char_data.get('gainTime'),
+        'skills': char_data.get('skills', []),
+        'currentEquip': char_data.get('currentEquip')
+    }
 
 
 @router.get('/fixtures/operators')
 async def get_operators(
+    request: Request,
     ids: Optional[str] = None,
     min_level: Optional[int] = None,
     max_level: Optional[int] = None,
@@ -36,88 +50,48 @@ async def get_operators(
     - min_elite: Minimum elite level (0-2)
     - max_elite: Maximum elite level (0-2)
     - min_potential: Minimum potential rank (0-5)
+
+    Responses are encoded once per distinct filter and carry an ETag.
     """
     try:
-        fixture_data = load_fixture_data()
-        chars_dict = fixture_data.get('data', {}).get('user', {}).get('troop', {}).get('chars', {})
-
-        # Parse comma-separated IDs
-        id_list = ids.split(',') if ids else None
-
-        operators = []
-        for char_data in chars_dict.values():
-            char_id = char_data.get('charId', '')
-            level = char_data.get('level', 0)
-            evolve_phase = char_data.get('evolvePhase', 0)
-            potential_rank = char_data.get('potentialRank', 0)
-
-            # Apply filters
-            if id_list and char_id not in id_list:
-                continue
-            if min_level and level < min_level:
-                continue
-            if max_level and level > max_level:
-                continue
-            if min_elite is not None and evolve_phase < min_elite:
-                continue
-            if max_elite is not None and evolve_phase > max_elite:
-                continue
-            if min_potential is not None and potential_rank < min_potential:
-                continue
-
-            operators.append({
-                'charId': char_id,
-                'level': level,
-                'evolvePhase': evolve_phase,
-                'elite': evolve_phase,  # alias
-                'potentialRank': potential_rank,
-                'potential': potential_rank,  # alias
-                'mainSkillLvl': char_data.get('mainSkillLvl', 0),
-                'favorPoint': char_data.get('favorPoint', 0),
-                'skin': char_data.get('skin'),
-                'defaultSkillIndex': char_data.get('defaultSkillIndex', -1),
-                'gainTime': char_data.get('gainTime'),
-                'skills': char_data.get('skills', []),
-                'currentEquip': char_data.get('currentEquip')
-            })
-
-        return {'ok': True, 'operators': operators}
+        # Parse comma-separated IDs; results are in roster order, so id order doesn't matter
+        id_list = tuple(sorted(set(ids.split(',')))) if ids else None
+        # a level bound of 0 means "no filter", same as omitting it
+        params = (id_list, min_level or None, max_level or None, min_elite, max_elite, min_potential)
+
+        def build():
+            matches = fixture_store.roster().filter(
+                ids=id_list,
+                min_level=min_level,
+                max_level=max_level,
+                min_elite=min_elite,
+                max_elite=max_elite,
+                min_potential=min_potential,
+            )
+            return {'ok': True, 'operators': [_operator_dict(char_data) for char_data in matches]}
+
+        body = fixture_responses.get(fixture_store.version, ('operators', params), build)
+        return body_response(request, body)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get('/fixtures/operator/{char_id}')
-async def get_operator(char_id: str):
+async def get_operator(char_id: str, request: Request):
     """Get a specific operator by ID from fixture data.
 
     Equivalent to GraphQL query: operator
     """
     try:
-        fixture_data = load_fixture_data()
-        chars_dict = fixture_data.get('data', {}).get('user', {}).get('troop', {}).get('chars', {})
-
-        for char_data in chars_dict.values():
-            if char_data.get('charId') == char_id:
-                return {
-                    'ok': True,
-                    'operator': {
-                        'charId': char_data.get('charId', ''),
-                        'level': char_data.get('level', 0),
-                        'evolvePhase': char_data.get('evolvePhase', 0),
-                        'elite': char_data.get('evolvePhase', 0),
-                        'potentialRank': char_data.get('potentialRank', 0),
-                        'potential': char_data.get('potentialRank', 0),
-                        'mainSkillLvl': char_data.get('mainSkillLvl', 0),
-                        'favorPoint': char_data.get('favorPoint', 0),
-                        'skin': char_data.get('skin'),
-                        'defaultSkillIndex': char_data.get('defaultSkillIndex', -1),
-                        'gainTime': char_data.get('gainTime'),
-                        'skills': char_data.get('skills', []),
-                        'currentEquip': char_data.get('currentEquip')
-                    }
-                }
-
-        raise HTTPException(status_code=404, detail=f'Operator {char_id} not found')
+        char_data = fixture_store.roster().get(char_id)
+        if char_data is None:
+            raise HTTPException(status_code=404, detail=f'Operator {char_id} not found')
+
+        body = fixture_responses.get(
+            fixture_store.version, ('operator', char_id),
+            lambda: {'ok': True, 'operator': _operator_dict(char_data)},
+        )
+        return body_response(request, body)
     except HTTPException:
         raise
     except Exception as e:
@@ -125,19 +99,18 @@ async def get_operator(char_id: str):
 
 
 @router.get('/fixtures/user-status')
-async def get_user_status():
+async def get_user_status(request: Request):
     """Get user account status from fixture data.
 
     Equivalent to GraphQL query: userStatus
     """
     try:
-        fixture_data = load_fixture_data()
-        status_data = fixture_data.get('data', {}).get('user', {}).get('status', {})
+        status_data = fixture_store.status()
 
         if not status_data:
             raise HTTPException(status_code=404, detail='Status data not found')
 
-        return {
+        body = fixture_responses.get(fixture_store.version, ('user-status',), lambda: {
             'ok': True,
             'status': {
                 'nickName': status_data.get('nickName', ''),
@@ -147,7 +120,8 @@ async def get_user_status():
                 'socialPoint': status_data.get('socialPoint', 0),
                 'uid': status_data.get('uid', '')
             }
-        }
+        })
+        return body_response(request, body)
     except HTTPException:
         raise
     except Exception as e:
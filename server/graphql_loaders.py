@@ -0,0 +1,132 @@
+"""Per-request DataLoaders for the GraphQL player resolvers.
+
+`getPlayer`, `expandPlayers`, `getRawPlayerData` and `getRawPlayersData`
+load through these instead of calling upstream directly. Every id
+requested by any field of one query is collected and deduplicated, then
+fetched with a single `expand_player_ids` / `get_raw_player_info` call
+per server. Loaders live in the request context, so nothing is shared
+between queries.
+"""
+
+from typing import Any, NamedTuple, Optional
+
+from strawberry.dataloader import DataLoader
+
+from . import ark_client
+
+
+def player_key(player: dict) -> str:
+    """Return the id a player summary belongs to."""
+    return str(player.get('id') or player.get('playerId') or player.get('uid') or '')
+
+
+class PlayerLookup(NamedTuple):
+    """A player loader result: the id's summary and its batch's extra summaries."""
+
+    player: Optional[dict]
+    # summaries upstream returned under an id nobody asked for; the same
+    # list object for every id of one batch
+    extra: list[dict]
+
+
+def split_players(players: list[dict], ids: list[str]) -> tuple[list[Optional[dict]], list[dict]]:
+    """Match expanded summaries back to the requested ids.
+
+    Summaries are matched on their id. Per-id fallbacks may resolve to a
+    summary with a different id; those can't be attributed to an id and
+    are returned separately, in order.
+    """
+    wanted = set(ids)
+    by_id: dict[str, dict] = {}
+    extra: list[dict] = []
+    for p in players:
+        key = player_key(p)
+        if key in wanted and key not in by_id:
+            by_id[key] = p
+        else:
+            extra.append(p)
+    return [by_id.get(i) for i in ids], extra
+
+
+def expanded_players(lookups: list[PlayerLookup]) -> list[dict]:
+    """Summaries for an `expandPlayers` field: matched ones in id order, then batch extras."""
+    players = [lookup.player for lookup in lookups if lookup.player is not None]
+    batches = {id(lookup.extra): lookup.extra for lookup in lookups}
+    return players + [p for extra in batches.values() for p in extra]
+
+
+def split_raw_players(raw: Any, ids: list[str]) -> list[Any]:
+    """Split a batched `get_raw_player_info` response into one payload per id.
+
+    Entries of `players` are matched on `uid`. A response whose entries
+    can't be attributed is returned as-is for every id.
+    """
+    if len(ids) == 1:
+        return [raw]
+    players = raw.get('players') if isinstance(raw, dict) else None
+    by_uid: dict[str, Any] = {}
+    if isinstance(players, list):
+        for entry in players:
+            if isinstance(entry, dict) and 'uid' in entry:
+                by_uid.setdefault(str(entry['uid']), entry)
+    if not by_uid:
+        return [raw] * len(ids)
+    return [{**raw, 'players': [by_uid[i]] if i in by_uid else []} for i in ids]
+
+
+def merge_raw_players(payloads: list[Any]) -> Any:
+    """Inverse of `split_raw_players` for a multi-id field."""
+    if not payloads:
+        return {'players': []}
+    first = payloads[0]
+    if all(p is first for p in payloads) or not isinstance(first, dict):
+        return first
+    players = [e for p in payloads if isinstance(p, dict) for e in p.get('players', [])]
+    return {**first, 'players': players}
+
+
+class PlayerLoaders:
+    """DataLoaders for one GraphQL request, one pair per server region."""
+
+    def __init__(self):
+        self._players: dict[str, DataLoader[str, PlayerLookup]] = {}
+        self._raw: dict[str, DataLoader[str, Any]] = {}
+
+    def players(self, server: str) -> DataLoader[str, PlayerLookup]:
+        """Loader of player summaries (or None) by player id."""
+        loader = self._players.get(server)
+        if loader is None:
+            async def load(ids: list[str]) -> list[PlayerLookup]:
+                players = await ark_client.expand_player_ids(list(ids), server=server)
+                found, extra = split_players(players, list(ids))
+                return [PlayerLookup(player, extra) for player in found]
+
+            loader = self._players[server] = DataLoader(load_fn=load)
+        return loader
+
+    def raw(self, server: str) -> DataLoader[str, Any]:
+        """Loader of raw upstream player payloads by player id."""
+        loader = self._raw.get(server)
+        if loader is None:
+            async def load(ids: list[str]) -> list[Any]:
+                client = ark_client._make_client(server)
+                if not hasattr(client, 'get_raw_player_info'):
+                    return [None] * len(ids)
+                raw = await ark_client.call_upstream(server, 'player', client.get_raw_player_info, list(ids), server=server)
+                return split_raw_players(raw, list(ids))
+
+            loader = self._raw[server] = DataLoader(load_fn=load)
+        return loader
+
+
+async def get_context() -> dict:
+    """GraphQLRouter context_getter: fresh loaders for every request."""
+    return {'loaders': PlayerLoaders()}
+
+
+def loaders(info) -> PlayerLoaders:
+    """Return the request's loaders, creating them for contexts built elsewhere."""
+    context = info.context
+    if isinstance(context, dict):
+        return context.setdefault('loaders', PlayerLoaders())
+    return PlayerLoaders()
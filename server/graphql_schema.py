@@ -1,26 +1,21 @@
 """GraphQL schema for Arknights character data."""
+import dataclasses
 import strawberry
-from typing import Optional, List
+from typing import Mapping, Optional, List
 import os
-import json
-from pathlib import Path
 
-
-USE_FIXTURES = os.getenv('USE_FIXTURES', 'true').lower() == 'true'
+from .fixture_store import fixture_store
+from .graphql_loaders import expanded_players, loaders, merge_raw_players
+from .persisted_queries import document_cache_extensions
 
 
-def load_fixture_data():
-    """Load user data from fixture file for development."""
-    fixture_path = Path(__file__).parent / 'tests' / 'user_data_response.json'
-    with open(fixture_path, 'r') as f:
-        return json.load(f)
+USE_FIXTURES = os.getenv('USE_FIXTURES', 'true').lower() == 'true'
 
 
 async def get_user_data_with_auth(channel_uid: str, yostar_token: str, server: str):
     """Get user data using authentication credentials."""
     if USE_FIXTURES:
-        fixture_data = load_fixture_data()
-        return fixture_data.get('data', {}).get('user', {})
+        return fixture_store.user()
     
     # Import here to avoid circular dependency
     from .ark_client import get_user_data
@@ -71,7 +66,11 @@ class TmplEquip:
 
 @strawberry.type
 class Operator:
-    """Arknights operator (character) data."""
+    """Arknights operator (character) data.
+
+    Scalars are copied from the raw `troop.chars` entry up front; nested
+    data (skills, equipment) is only built when the query selects it.
+    """
     char_id: str
     level: int
     evolve_phase: int
@@ -81,8 +80,8 @@ class Operator:
     skin: Optional[str] = None
     default_skill_index: Optional[int] = None
     gain_time: Optional[int] = None
-    skills: Optional[List[Skill]] = None
     current_equip: Optional[str] = None
+    raw: strawberry.Private[Mapping] = dataclasses.field(default_factory=dict)
     
     @strawberry.field
     def id(self) -> str:
@@ -109,6 +108,50 @@ class Operator:
         """Trust points (alias for favor_point)."""
         return self.favor_point
 
+    @strawberry.field
+    def skills(self) -> Optional[List[Skill]]:
+        """Operator skills, built from the raw entry when selected."""
+        if 'skills' not in self.raw:
+            return None
+        return [
+            Skill(
+                unlock=s.get('unlock', 0),
+                level=s.get('level', 0),
+                state=s.get('state'),
+                specialize_level=s.get('specializeLevel'),
+                complete_upgrade_time=s.get('completeUpgradeTime'),
+            )
+            for s in self.raw['skills']
+        ]
+
+    @strawberry.field
+    def equip(self) -> Optional[List[TmplEquip]]:
+        """Unlocked modules, built from the raw entry when selected."""
+        equip = self.raw.get('equip')
+        if equip is None:
+            return None
+        return [
+            TmplEquip(id=equip_id, level=EquipLevel(level=e.get('level', 0), hide=e.get('hide', 0)))
+            for equip_id, e in equip.items()
+        ]
+
+
+def operator_from_char(char_data) -> Operator:
+    """Build an Operator from a raw `troop.chars` entry."""
+    return Operator(
+        char_id=char_data.get('charId', ''),
+        level=char_data.get('level', 0),
+        evolve_phase=char_data.get('evolvePhase', 0),
+        potential_rank=char_data.get('potentialRank', 0),
+        main_skill_lvl=char_data.get('mainSkillLvl', 0),
+        favor_point=char_data.get('favorPoint', 0),
+        skin=char_data.get('skin'),
+        default_skill_index=char_data.get('defaultSkillIndex', -1),
+        gain_time=char_data.get('gainTime'),
+        current_equip=char_data.get('currentEquip'),
+        raw=char_data,
+    )
+
 
 @strawberry.type
 class UserStatus:
@@ -176,91 +219,32 @@ class Query:
             max_elite: Maximum elite level (0-2)
             min_potential: Minimum potential rank (0-5)
         """
-        fixture_data = load_fixture_data()
-        chars_dict = fixture_data.get('data', {}).get('user', {}).get('troop', {}).get('chars', {})
-        
-        operators = []
-        for char_data in chars_dict.values():
-            # Map snake_case to camelCase for GraphQL
-            operator = Operator(
-                char_id=char_data.get('charId', ''),
-                level=char_data.get('level', 0),
-                evolve_phase=char_data.get('evolvePhase', 0),
-                potential_rank=char_data.get('potentialRank', 0),
-                main_skill_lvl=char_data.get('mainSkillLvl', 0),
-                favor_point=char_data.get('favorPoint', 0),
-                skin=char_data.get('skin'),
-                default_skill_index=char_data.get('defaultSkillIndex', -1),
-                gain_time=char_data.get('gainTime'),
-                skills=[
-                    Skill(
-                        unlock=s.get('unlock', 0),
-                        level=s.get('level', 0),
-                        state=s.get('state'),
-                        specialize_level=s.get('specializeLevel'),
-                        complete_upgrade_time=s.get('completeUpgradeTime'),
-                    )
-                    for s in char_data.get('skills', [])
-                ] if 'skills' in char_data else None,
-                current_equip=char_data.get('currentEquip'),
-            )
-            
-            # Apply filters
-            if ids and operator.char_id not in ids:
-                continue
-            if min_level and operator.level < min_level:
-                continue
-            if max_level and operator.level > max_level:
-                continue
-            if min_elite is not None and operator.evolve_phase < min_elite:
-                continue
-            if max_elite is not None and operator.evolve_phase > max_elite:
-                continue
-            if min_potential is not None and operator.potential_rank < min_potential:
-                continue
-            
-            operators.append(operator)
-        
-        return operators
+        # Only the matching operators are materialized
+        matches = fixture_store.roster().filter(
+            ids=ids,
+            min_level=min_level,
+            max_level=max_level,
+            min_elite=min_elite,
+            max_elite=max_elite,
+            min_potential=min_potential,
+        )
+        return [operator_from_char(char_data) for char_data in matches]
     
     @strawberry.field
     def operator(self, char_id: str) -> Optional[Operator]:
         """Get a specific operator by ID."""
-        fixture_data = load_fixture_data()
-        chars_dict = fixture_data.get('data', {}).get('user', {}).get('troop', {}).get('chars', {})
-        
-        for char_data in chars_dict.values():
-            if char_data.get('charId') == char_id:
-                return Operator(
-                    char_id=char_data.get('charId', ''),
-                    level=char_data.get('level', 0),
-                    evolve_phase=char_data.get('evolvePhase', 0),
-                    potential_rank=char_data.get('potentialRank', 0),
-                    main_skill_lvl=char_data.get('mainSkillLvl', 0),
-                    favor_point=char_data.get('favorPoint', 0),
-                    skin=char_data.get('skin'),
-                    default_skill_index=char_data.get('defaultSkillIndex', -1),
-                    gain_time=char_data.get('gainTime'),
-                    skills=[
-                        Skill(
-                            unlock=s.get('unlock', 0),
-                            level=s.get('level', 0),
-                            state=s.get('state'),
-                            specialize_level=s.get('specializeLevel'),
-                            complete_upgrade_time=s.get('completeUpgradeTime'),
-                        )
-                        for s in char_data.get('skills', [])
-                    ] if 'skills' in char_data else None,
-                    current_equip=char_data.get('currentEquip'),
-                )
-        
-        return None
+        char_data = fixture_store.roster().get(char_id)
+        return operator_from_char(char_data) if char_data is not None else None
+
+    @strawberry.field
+    def operators_by_ids(self, ids: List[str]) -> List[Operator]:
+        """Get several operators by ID, in request order; unknown IDs are skipped."""
+        return [operator_from_char(char_data) for char_data in fixture_store.roster().get_many(ids)]
     
     @strawberry.field
     def user_status(self) -> Optional[UserStatus]:
         """Get user account status information."""
-        fixture_data = load_fixture_data()
-        status_data = fixture_data.get('data', {}).get('user', {}).get('status', {})
+        status_data = fixture_store.status()
         
         if not status_data:
             return None
@@ -285,32 +269,7 @@ class Query:
         user_data = await get_user_data_with_auth(channel_uid, yostar_token, server)
         chars_dict = user_data.get('troop', {}).get('chars', {})
         
-        operators = []
-        for char_data in chars_dict.values():
-            operators.append(Operator(
-                char_id=char_data.get('charId', ''),
-                level=char_data.get('level', 0),
-                evolve_phase=char_data.get('evolvePhase', 0),
-                potential_rank=char_data.get('potentialRank', 0),
-                main_skill_lvl=char_data.get('mainSkillLvl', 0),
-                favor_point=char_data.get('favorPoint', 0),
-                skin=char_data.get('skin'),
-                default_skill_index=char_data.get('defaultSkillIndex', -1),
-                gain_time=char_data.get('gainTime'),
-                skills=[
-                    Skill(
-                        unlock=s.get('unlock', 0),
-                        level=s.get('level', 0),
-                        state=s.get('state'),
-                        specialize_level=s.get('specializeLevel'),
-                        complete_upgrade_time=s.get('completeUpgradeTime'),
-                    )
-                    for s in char_data.get('skills', [])
-                ] if 'skills' in char_data else None,
-                current_equip=char_data.get('currentEquip'),
-            ))
-        
-        return operators
+        return [operator_from_char(char_data) for char_data in chars_dict.values()]
     
     @strawberry.field
     async def my_status(
@@ -364,13 +323,14 @@ class Query:
     @strawberry.field
     async def expand_players(
         self,
+        info: strawberry.Info,
         ids: List[str],
         server: str = "en"
     ) -> PlayerExpandResult:
         """Get detailed player information (equivalent to POST /players/expand)."""
         try:
-            from .ark_client import expand_player_ids
-            players_data = await expand_player_ids(ids, server=server)
+            lookups = await loaders(info).players(server).load_many(list(dict.fromkeys(ids)))
+            players_data = expanded_players(lookups)
 
             players = [
                 Player(
@@ -389,18 +349,17 @@ class Query:
     @strawberry.field
     async def get_player(
         self,
+        info: strawberry.Info,
         player_id: str,
         server: str = "en"
     ) -> Optional[Player]:
         """Get a single player's details (equivalent to GET /characters/{player_id})."""
         try:
-            from .ark_client import expand_player_ids
-            players_data = await expand_player_ids([player_id], server=server)
+            p = (await loaders(info).players(server).load(player_id)).player
 
-            if not players_data:
+            if not p:
                 return None
 
-            p = players_data[0]
             return Player(
                 player_id=p.get('playerId', p.get('uid', '')),
                 nick_name=p.get('nickName'),
@@ -428,6 +387,7 @@ class Query:
     @strawberry.field
     async def get_raw_player_data(
         self,
+        info: strawberry.Info,
         player_id: str,
         server: str = "en"
     ) -> Optional[str]:
@@ -437,14 +397,11 @@ class Query:
         Useful for debugging and accessing complete player data.
         """
         try:
-            from .ark_client import _make_client
-            client = _make_client()
-
-            if not hasattr(client, 'get_raw_player_info'):
+            raw = await loaders(info).raw(server).load(player_id)
+            if raw is None:
                 return None
 
             import json
-            raw = await client.get_raw_player_info([player_id], server=server)
             return json.dumps(raw)
         except Exception:
             return None
@@ -452,6 +409,7 @@ class Query:
     @strawberry.field
     async def get_raw_players_data(
         self,
+        info: strawberry.Info,
         ids: List[str],
         server: str = "en"
     ) -> Optional[str]:
@@ -460,15 +418,12 @@ class Query:
         Returns the full raw upstream JSON payload for multiple players.
         """
         try:
-            from .ark_client import _make_client
-            client = _make_client()
-
-            if not hasattr(client, 'get_raw_player_info'):
+            payloads = await loaders(info).raw(server).load_many(list(dict.fromkeys(ids)))
+            if any(p is None for p in payloads):
                 return None
 
             import json
-            raw = await client.get_raw_player_info(ids, server=server)
-            return json.dumps(raw)
+            return json.dumps(merge_raw_players(payloads))
         except Exception:
             return None
 
@@ -527,4 +482,4 @@ class Mutation:
             return AuthTokenResult(success=False, error=str(e))
 
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+schema = strawberry.Schema(query=Query, mutation=Mutation, extensions=document_cache_extensions())
@@ -0,0 +1,88 @@
+"""Extract selected subtrees from large JSON documents.
+
+The fixture and `syncData` payloads are multi-megabyte, but the app only
+reads a couple of subtrees (`user.troop.chars`, `user.status`). Paths are
+tuples of object keys, e.g. `('user', 'troop', 'chars')`.
+
+`load_sections` picks the fastest parser available:
+
+- ijson with a C backend streams the file once per path and only builds
+  the selected subtree, stopping as soon as it has been read; the rest of
+  the document is skipped as parse events.
+- otherwise orjson (or the stdlib json module) parses the document,
+  and the selected subtrees are copied out so the rest can be freed
+  straight away.
+
+Both are optional; the pure-Python ijson backend is slower than a full
+parse, so it is not used.
+"""
+
+import json
+from typing import IO, Iterable, Sequence, Union
+from pathlib import Path
+
+try:
+    import ijson
+    if 'yajl2_c' not in getattr(ijson, 'backend', ''):
+        ijson = None
+except Exception:
+    ijson = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+Paths = Sequence[tuple]
+
+_MISSING = object()
+
+
+def loads(data: Union[bytes, str]):
+    """Parse a whole JSON document with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extract(data, paths: Paths) -> dict:
+    """Return a dict holding only `paths` of `data`, nested as in the source.
+
+    Missing paths are skipped.
+    """
+    out: dict = {}
+    for path in paths:
+        src = data
+        for key in path:
+            if not isinstance(src, dict) or key not in src:
+                break
+            src = src[key]
+        else:
+            _assign(out, path, src)
+    return out
+
+
+def _assign(out: dict, path: tuple, value) -> None:
+    for key in path[:-1]:
+        out = out.setdefault(key, {})
+    out[path[-1]] = value
+
+
+def _stream(f: IO[bytes], paths: Paths) -> dict:
+    out: dict = {}
+    for path in paths:
+        f.seek(0)
+        # stop at the first match: the parser never reads past the subtree
+        value = next(ijson.items(f, '.'.join(path), use_float=True), _MISSING)
+        if value is not _MISSING:
+            _assign(out, path, value)
+    return out
+
+
+def load_sections(path: Union[str, Path], paths: Iterable[tuple]) -> dict:
+    """Read `path` and return only the subtrees at `paths` (see `extract`)."""
+    paths = [tuple(p) for p in paths]
+    with open(path, 'rb') as f:
+        if ijson is not None:
+            return _stream(f, paths)
+        return extract(loads(f.read()), paths)
@@ -3,23 +3,49 @@
 import time
 import logging
 import json
+import random
 import re
-from typing import Callable
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request
+from fastapi.exception_handlers import http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
-from strawberry.fastapi import GraphQLRouter
 
-from .auth import router as auth_router
+from .auth import router as auth_router, USE_FIXTURES
 from .players import router as players_router
 from .fixtures import router as fixtures_router
+from .static_avatars import router as static_avatars_router
 from .graphql_schema import schema
+from .graphql_loaders import get_context as graphql_context
+from .persisted_queries import PersistedQueryRouter
+from .compression import CompressionMiddleware
+from .fixture_store import fixture_store
+from .ark_client import clients, WARM_SERVERS, search_cache_stats, user_data_cache_stats
+from .circuit_breaker import CircuitOpen, breakers, service_unavailable
+from .player_directory import player_directory
+from .rate_limit import RateLimited, governor, too_many_requests
+from . import avatar_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('ak-chars.server')
 
-app = FastAPI(title='ak-chars-auth')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the fixture up front so the first fixture-mode request doesn't pay for it
+    if USE_FIXTURES:
+        fixture_store.load()
+    # Keep one warm arkprts client per region for the lifetime of the app
+    await clients.warm(WARM_SERVERS)
+    try:
+        yield
+    finally:
+        await clients.aclose()
+        await avatar_cache.aclose()
+        player_directory.close()
+
+
+app = FastAPI(title='ak-chars-auth', lifespan=lifespan)
 
 # Configure CORS
 import os
@@ -44,106 +70,213 @@ app.add_middleware(
 )
 
 
+SENSITIVE_FIELDS = frozenset(f.lower() for f in (
+    'yostar_token', 'token', 'channel_uid', 'channelUid',
+    'password', 'secret', 'api_key', 'apiKey',
+    'code', 'authorization', 'auth', 'email',
+))
+SENSITIVE_HEADERS = frozenset({'authorization', 'cookie', 'x-api-key', 'api-key'})
+REDACTED = '***REDACTED***'
+
+_SENSITIVE_ALTERNATION = '|'.join(sorted((re.escape(f) for f in SENSITIVE_FIELDS), key=len, reverse=True))
+# Cheap pre-check: most bodies (rosters, player lists) contain none of the key
+# names. Plain substring tests on the lowercased text are far cheaper than an
+# IGNORECASE regex; keys containing a shorter key (yostar_token/token) are implied.
+_SENSITIVE_HINTS = tuple(f for f in SENSITIVE_FIELDS if not any(o != f and o in f for o in SENSITIVE_FIELDS))
+# A quoted sensitive key followed by a scalar value, or by the start of an object/array
+_SENSITIVE_PAIR = re.compile(
+    r"""(?P<q>["'])(?P<key>%s)(?P=q)\s*:\s*"""
+    r"""(?:"(?:[^"\\]|\\.)*"?|'(?:[^'\\]|\\.)*'?|-?[\d.eE+]+|true|false|null|(?P<nested>[\[{]))"""
+    % _SENSITIVE_ALTERNATION,
+    re.IGNORECASE,
+)
+
+
+def _mask_json(obj):
+    if isinstance(obj, dict):
+        return {k: REDACTED if k.lower() in SENSITIVE_FIELDS else _mask_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_mask_json(item) for item in obj]
+    return obj
+
+
 def sanitize_sensitive_data(text: str) -> str:
-    """Mask sensitive data in logs to prevent credential leakage."""
-    try:
-        data = json.loads(text)
-        sensitive_fields = {
-            'yostar_token', 'token', 'channel_uid', 'channelUid',
-            'password', 'secret', 'api_key', 'apiKey',
-            'code', 'authorization', 'auth', 'email'
-        }
-        
-        def mask_dict(obj):
-            if isinstance(obj, dict):
-                return {
-                    k: '***REDACTED***' if k.lower() in {f.lower() for f in sensitive_fields}
-                    else mask_dict(v)
-                    for k, v in obj.items()
-                }
-            elif isinstance(obj, list):
-                return [mask_dict(item) for item in obj]
-            return obj
-        
-        masked = mask_dict(data)
-        return json.dumps(masked)
-    except Exception:
-        patterns = [
-            (r'"(yostar_token|token|channel_uid|channelUid|password|secret|api_key|apiKey|code|authorization|email)"\s*:\s*"[^"]*"', r'"\1": "***REDACTED***"'),
-            (r"'(yostar_token|token|channel_uid|channelUid|password|secret|api_key|apiKey|code|authorization|email)'\s*:\s*'[^']*'", r"'\1': '***REDACTED***'"),
-        ]
-        for pattern, replacement in patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    """Mask sensitive data in logs to prevent credential leakage.
+
+    Text without any sensitive key name is returned as is. Otherwise one
+    regex pass replaces the value of every quoted sensitive key (JSON or
+    Python-repr style, truncated bodies included). Only when a sensitive key
+    holds an object or array is the text parsed as JSON and masked as a tree.
+    """
+    lowered = text.lower()
+    if not any(hint in lowered for hint in _SENSITIVE_HINTS):
         return text
 
+    nested = False
+
+    def redact(m):
+        nonlocal nested
+        if m.group('nested'):
+            nested = True
+            return m.group(0)
+        q = m.group('q')
+        return f'{q}{m.group("key")}{q}: {q}{REDACTED}{q}'
+
+    masked = _SENSITIVE_PAIR.sub(redact, text)
+    if nested:
+        try:
+            return json.dumps(_mask_json(json.loads(text)))
+        except ValueError:
+            pass
+    return masked
+
 
 def sanitize_headers(headers: dict) -> dict:
     """Remove sensitive headers from logs."""
     safe_headers = {}
-    sensitive_keys = {'authorization', 'cookie', 'x-api-key', 'api-key'}
     for key, value in headers.items():
-        if key.lower() in sensitive_keys:
-            safe_headers[key] = '***REDACTED***'
+        if key.lower() in SENSITIVE_HEADERS:
+            safe_headers[key] = REDACTED
         else:
             safe_headers[key] = value
     return safe_headers
 
 
-@app.middleware('http')
-async def log_requests(request: Request, call_next: Callable):
-    start = time.time()
-    try:
-        req_body_bytes = await request.body()
-        try:
-            req_body = req_body_bytes.decode('utf-8')
-        except Exception:
-            req_body = repr(req_body_bytes)[:1000]
-    except Exception as e:
-        req_body = f'<could not read body: {e}>'
+def _parse_route_body_bytes(spec: str) -> dict[str, int]:
+    """Parse 'PREFIX=BYTES,...' into a route-prefix -> body byte limit map."""
+    limits = {}
+    for item in spec.split(','):
+        prefix, sep, value = item.strip().partition('=')
+        if sep and prefix:
+            try:
+                limits[prefix] = int(value)
+            except ValueError:
+                continue
+    return limits
 
-    safe_headers = sanitize_headers(dict(request.headers))
-    safe_body = sanitize_sensitive_data(req_body[:2000])
-    logger.info('--> %s %s headers=%s body=%s', request.method, request.url.path, safe_headers, safe_body)
 
-    response = await call_next(request)
+# Bytes of request/response body to log, sampling rate, and per-route overrides
+LOG_BODY_BYTES = int(os.getenv('LOG_BODY_BYTES', '2000'))
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+LOG_ROUTE_BODY_BYTES = _parse_route_body_bytes(os.getenv('LOG_ROUTE_BODY_BYTES', '/avatars=0,/operator-avatars=0'))
 
-    try:
-        if isinstance(response, StreamingResponse):
-            body = b''
-            async for chunk in response.body_iterator:
-                body += chunk
-            text = body.decode('utf-8', errors='replace')
-            safe_resp_body = sanitize_sensitive_data(text[:2000])
-            new_response = Response(content=body, status_code=response.status_code, headers=dict(response.headers), media_type=response.media_type)
-            duration = time.time() - start
-            logger.info('<-- %s %s status=%s time=%.3fs body=%s', request.method, request.url.path, response.status_code, duration, safe_resp_body)
-            return new_response
-        else:
+
+class RequestLoggingMiddleware:
+    """Log HTTP traffic with a bounded, sanitized prefix of each body.
+
+    Pure ASGI middleware: request and response messages are passed through
+    untouched while at most `max_body_bytes` of each body is copied aside
+    for the log line, so streaming responses keep streaming. Routes can
+    override the byte limit by path prefix (0 disables body logging), and
+    `sample_rate` logs only a fraction of requests.
+    """
+
+    def __init__(self, app, max_body_bytes: int = LOG_BODY_BYTES, sample_rate: float = LOG_SAMPLE_RATE, route_body_bytes: dict[str, int] | None = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.sample_rate = sample_rate
+        self.route_body_bytes = LOG_ROUTE_BODY_BYTES if route_body_bytes is None else route_body_bytes
+
+    def body_limit(self, path: str) -> int:
+        matches = [prefix for prefix in self.route_body_bytes if path.startswith(prefix)]
+        if not matches:
+            return self.max_body_bytes
+        return self.route_body_bytes[max(matches, key=len)]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.time()
+        method, path = scope['method'], scope['path']
+        limit = self.body_limit(path)
+        req_body = bytearray()
+        resp_body = bytearray()
+        status = None
+        encoded = None
+        request_logged = False
+
+        def log_request():
+            nonlocal request_logged
+            if request_logged:
+                return
+            request_logged = True
+            headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope.get('headers', [])}
+            safe_body = sanitize_sensitive_data(req_body.decode('utf-8', errors='replace'))
+            logger.info('--> %s %s headers=%s body=%s', method, path, sanitize_headers(headers), safe_body)
+
+        async def receive_and_tee():
+            message = await receive()
+            if message['type'] == 'http.request' and len(req_body) < limit:
+                req_body.extend(message.get('body', b'')[:limit - len(req_body)])
+            return message
+
+        async def send_and_tee(message):
+            nonlocal status, encoded
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                # compressed bodies aren't readable; log the encoding instead
+                encoded = next((v.decode('latin-1') for k, v in message.get('headers', []) if k.lower() == b'content-encoding'), None)
+                log_request()
+            elif message['type'] == 'http.response.body' and encoded is None and len(resp_body) < limit:
+                resp_body.extend(message.get('body', b'')[:limit - len(resp_body)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_tee, send_and_tee)
+        finally:
             try:
-                resp_body = response.body
-            except Exception:
-                resp_body = b''
-            if isinstance(resp_body, (bytes, bytearray)):
-                text = resp_body.decode('utf-8', errors='replace')
-            else:
-                text = str(resp_body)
-            safe_resp_body = sanitize_sensitive_data(text[:2000])
-            duration = time.time() - start
-            logger.info('<-- %s %s status=%s time=%.3fs body=%s', request.method, request.url.path, response.status_code, duration, safe_resp_body)
-            return response
-    except Exception as e:
-        logger.exception('Error logging response: %s', e)
-        return response
+                log_request()
+                if encoded is None:
+                    safe_resp_body = sanitize_sensitive_data(resp_body.decode('utf-8', errors='replace'))
+                else:
+                    safe_resp_body = f'<{encoded}>'
+                duration = time.time() - start
+                logger.info('<-- %s %s status=%s time=%.3fs body=%s', method, path, status, duration, safe_resp_body)
+            except Exception as e:
+                logger.exception('Error logging response: %s', e)
+
+
+app.add_middleware(RequestLoggingMiddleware)
+# outside the logger, so logged GraphQL/raw bodies are still plain JSON
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get('/cache/stats')
+async def cache_stats():
+    """Report in-process cache counters, upstream rate limits and circuit states."""
+    return {
+        'ok': True,
+        'userData': user_data_cache_stats(),
+        'search': search_cache_stats(),
+        'playerDirectory': await player_directory.stats(),
+        'upstream': governor.stats(),
+        'circuits': breakers.stats(),
+    }
+
+
+# Upstream calls refused locally surface as HTTP errors from any route
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return await http_exception_handler(request, too_many_requests(exc))
+
+
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen):
+    return await http_exception_handler(request, service_unavailable(exc))
 
 
 # Mount API routers
 app.include_router(auth_router)
 app.include_router(players_router)
 app.include_router(fixtures_router)
+app.include_router(static_avatars_router)
 
-# Mount GraphQL endpoint with CORS support
-graphql_app = GraphQLRouter(
+# Mount GraphQL endpoint with CORS support and automatic persisted queries
+graphql_app = PersistedQueryRouter(
     schema,
     graphiql=True,
+    context_getter=graphql_context,
 )
 app.include_router(graphql_app, prefix="/graphql")
@@ -0,0 +1,121 @@
+"""Automatic persisted queries (APQ) for the /graphql endpoint.
+
+Implements the Apollo APQ protocol. A client sends
+`extensions.persistedQuery = {"version": 1, "sha256Hash": ...}`, first
+without the query text. An unknown hash is answered with a
+`PersistedQueryNotFound` error; the client retries once with the full
+query, which is checked against the hash and stored. After that the hash
+alone is enough, including on GET
+(`/graphql?extensions=...&variables=...`), which keeps URLs short and
+cacheable by a CDN.
+
+Parsed and validated documents are cached separately by the schema's
+ParserCache/ValidationCache extensions (see `document_cache_extensions`),
+so hot queries skip both steps whether they arrive by hash or in full.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Optional
+
+from starlette.responses import JSONResponse
+from strawberry.extensions import ParserCache, ValidationCache
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from strawberry.types.unset import UNSET
+
+# hash -> query text entries, and parsed/validated documents, kept in LRUs
+PERSISTED_QUERY_MAXSIZE = int(os.getenv('GRAPHQL_PERSISTED_QUERY_MAXSIZE', '1000'))
+DOCUMENT_CACHE_MAXSIZE = int(os.getenv('GRAPHQL_DOCUMENT_CACHE_MAXSIZE', '256'))
+
+
+def document_cache_extensions(maxsize: int = DOCUMENT_CACHE_MAXSIZE) -> list:
+    """Schema extensions caching parse and validation results per query text."""
+    return [ParserCache(maxsize=maxsize), ValidationCache(maxsize=maxsize)]
+
+
+class PersistedQueryError(Exception):
+    """APQ protocol error, reported to the client as a GraphQL error."""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class PersistedQueryStore:
+    """LRU of sha256 hash -> query text."""
+
+    def __init__(self, maxsize: int = PERSISTED_QUERY_MAXSIZE):
+        self.maxsize = maxsize
+        self._queries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, digest: str) -> Optional[str]:
+        query = self._queries.get(digest)
+        if query is not None:
+            self._queries.move_to_end(digest)
+        return query
+
+    def register(self, digest: str, query: str) -> None:
+        """Store `query` under `digest` after checking that it hashes to it."""
+        if hashlib.sha256(query.encode('utf-8')).hexdigest() != digest:
+            raise HTTPException(400, 'provided sha does not match query')
+        self._queries[digest] = query
+        self._queries.move_to_end(digest)
+        while len(self._queries) > self.maxsize:
+            self._queries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter that resolves `extensions.persistedQuery` hashes."""
+
+    def __init__(self, *args: Any, store: Optional[PersistedQueryStore] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.persisted_queries = store if store is not None else PersistedQueryStore()
+
+    def should_render_graphql_ide(self, request) -> bool:
+        # a hash-only GET has no `query` param but is not a browser visit
+        return 'extensions' not in request.query_params and super().should_render_graphql_ide(request)
+
+    async def _extensions(self, request) -> Any:
+        if request.method == 'GET':
+            raw = request.query_params.get('extensions')
+            return self.parse_json(raw) if raw else None
+        body = await request.get_body()
+        # skip a second JSON parse for the common, non-APQ request
+        if b'persistedQuery' not in body:
+            return None
+        data = self.parse_json(body)
+        return data.get('extensions') if isinstance(data, dict) else None
+
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        data = await super().parse_http_body(request)
+        extensions = await self._extensions(request)
+        persisted = extensions.get('persistedQuery') if isinstance(extensions, dict) else None
+        if not isinstance(persisted, dict):
+            return data
+
+        if persisted.get('version') != 1:
+            raise PersistedQueryError('PersistedQueryNotSupported', 'PERSISTED_QUERY_NOT_SUPPORTED')
+        digest = persisted.get('sha256Hash')
+        if not isinstance(digest, str):
+            raise HTTPException(400, 'persistedQuery.sha256Hash is required')
+
+        if data.query is None:
+            data.query = self.persisted_queries.get(digest)
+            if data.query is None:
+                raise PersistedQueryError('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+        else:
+            self.persisted_queries.register(digest, data.query)
+        return data
+
+    async def run(self, request, context=UNSET, root_value=UNSET):
+        try:
+            return await super().run(request, context=context, root_value=root_value)
+        except PersistedQueryError as e:
+            return JSONResponse({'errors': [{'message': e.message, 'extensions': {'code': e.code}}]})
@@ -0,0 +1,196 @@
+"""Local SQLite directory of every player the server has seen.
+
+Each `expand_player_ids` and `search_players` result (id, nickname, level)
+is written to a small SQLite database at PLAYER_DIRECTORY_PATH. The
+database has an index on (server, id) and on (server, normalized nickname).
+Lookups are answered from the directory while rows are younger than
+PLAYER_DIRECTORY_MAX_AGE seconds, and the data survives restarts.
+
+- Ids: `get_many` returns the fresh summaries, and only the other ids go
+  upstream.
+- Searches: the directory only knows players it has seen, so it answers a
+  nickname search only when a fresh, complete (untruncated) upstream search
+  for that query or a prefix of it is on record. See search_cache.py for the
+  same rule applied in memory.
+
+SQLite calls run in a worker thread (like avatar_cache.py's disk I/O), so a
+slow disk or a database locked by another worker never blocks the event
+loop. Rows not seen for PLAYER_DIRECTORY_RETENTION seconds are pruned when
+the database is opened. If the database cannot be opened, the directory logs a
+warning and stays empty, so lookups fall back to upstream.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from .search_cache import normalize_nickname
+
+logger = logging.getLogger('ak-chars.player_directory')
+
+PLAYER_DIRECTORY_PATH = os.getenv('PLAYER_DIRECTORY_PATH') or os.path.join(tempfile.gettempdir(), 'ak-chars-players.sqlite3')
+PLAYER_DIRECTORY_MAX_AGE = float(os.getenv('PLAYER_DIRECTORY_MAX_AGE', '3600'))
+PLAYER_DIRECTORY_RETENTION = float(os.getenv('PLAYER_DIRECTORY_RETENTION', str(30 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    server TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    name_key TEXT,
+    level INTEGER,
+    seen REAL NOT NULL,
+    PRIMARY KEY (server, id)
+);
+CREATE INDEX IF NOT EXISTS players_name ON players (server, name_key);
+CREATE TABLE IF NOT EXISTS searches (
+    server TEXT NOT NULL,
+    query TEXT NOT NULL,
+    seen REAL NOT NULL,
+    PRIMARY KEY (server, query)
+);
+"""
+
+
+class PlayerDirectory:
+    """Persistent id/nickname index of player summaries."""
+
+    def __init__(self, path: str = PLAYER_DIRECTORY_PATH, max_age: float = PLAYER_DIRECTORY_MAX_AGE,
+                 retention: float = PLAYER_DIRECTORY_RETENTION, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_age = max_age
+        self.retention = retention
+        self._clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._failed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or self._failed:
+            return self._conn
+        try:
+            # used from worker threads, one at a time under self._lock
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            cutoff = self._clock() - self.retention
+            conn.execute('DELETE FROM players WHERE seen < ?', (cutoff,))
+            conn.execute('DELETE FROM searches WHERE seen < ?', (cutoff,))
+        except sqlite3.Error as e:
+            logger.warning('player directory disabled, could not open %s: %s', self.path, e)
+            self._failed = True
+            return None
+        self._conn = conn
+        return conn
+
+    async def record(self, server: str, players: Iterable[dict], query: Optional[str] = None,
+                     limit: Optional[int] = None) -> None:
+        """Store player summaries; with `query`, also note a complete search for it."""
+        await asyncio.to_thread(self._locked, self._record, server, list(players), query, limit)
+
+    async def get_many(self, server: str, ids: Iterable[str]) -> dict[str, dict]:
+        """Return fresh summaries for the known ids, keyed by id."""
+        return await asyncio.to_thread(self._locked, self._get_many, server, list(ids))
+
+    async def search(self, server: str, nickname: str, limit: Optional[int]) -> Optional[list[dict]]:
+        """Answer a nickname search if a fresh complete search covers it, else None."""
+        return await asyncio.to_thread(self._locked, self._search, server, nickname, limit)
+
+    async def stats(self) -> dict:
+        return await asyncio.to_thread(self._locked, self._stats)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    def _record(self, server: str, players: list, query: Optional[str], limit: Optional[int]) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        now = self._clock()
+        rows = [
+            (server, str(p['id']), p.get('name'), normalize_nickname(p['name']) if isinstance(p.get('name'), str) else None,
+             p.get('level'), now)
+            for p in players if p.get('id') is not None
+        ]
+        complete = query is not None and (limit is None or len(rows) < limit)
+        try:
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(
+                    'INSERT INTO players (server, id, name, name_key, level, seen) VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (server, id) DO UPDATE SET name = excluded.name, name_key = excluded.name_key, '
+                    'level = excluded.level, seen = excluded.seen',
+                    rows,
+                )
+                if complete:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO searches (server, query, seen) VALUES (?, ?, ?)',
+                        (server, normalize_nickname(query), now),
+                    )
+        except sqlite3.Error as e:
+            logger.warning('could not record players in directory: %s', e)
+
+    def _get_many(self, server: str, ids: list) -> dict[str, dict]:
+        conn = self._connect()
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        if conn is None or not ids:
+            return {}
+        placeholders = ','.join('?' * len(ids))
+        try:
+            rows = conn.execute(
+                f'SELECT id, name, level FROM players WHERE server = ? AND id IN ({placeholders}) AND seen >= ?',
+                (server, *ids, self._clock() - self.max_age),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning('player directory lookup failed: %s', e)
+            return {}
+        self.hits += len(rows)
+        self.misses += len(ids) - len(rows)
+        return {pid: {'id': pid, 'name': name, 'level': level} for pid, name, level in rows}
+
+    def _search(self, server: str, nickname: str, limit: Optional[int]) -> Optional[list[dict]]:
+        query = normalize_nickname(nickname)
+        conn = self._connect()
+        if conn is None or not query or '#' in query:
+            return None
+        fresh = self._clock() - self.max_age
+        prefixes = [query[:end] for end in range(len(query), 0, -1)]
+        try:
+            covered = conn.execute(
+                f'SELECT 1 FROM searches WHERE server = ? AND query IN ({",".join("?" * len(prefixes))}) AND seen >= ? LIMIT 1',
+                (server, *prefixes, fresh),
+            ).fetchone()
+            if covered is None:
+                return None
+            rows = conn.execute(
+                'SELECT id, name, level FROM players WHERE server = ? AND name_key >= ? AND name_key < ? AND seen >= ? '
+                'ORDER BY name_key LIMIT ?',
+                (server, query, query + '\U0010ffff', fresh, -1 if limit is None else limit),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning('player directory search failed: %s', e)
+            return None
+        return [{'id': pid, 'name': name, 'level': level} for pid, name, level in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _stats(self) -> dict:
+        conn = self._connect()
+        size = conn.execute('SELECT COUNT(*) FROM players').fetchone()[0] if conn is not None else 0
+        return {'hits': self.hits, 'misses': self.misses, 'size': size, 'maxAge': self.max_age}
+
+
+player_directory = PlayerDirectory()
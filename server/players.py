@@ -1,10 +1,14 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
 
-from .ark_client import expand_player_ids, search_players, _make_client
+from .ark_client import call_upstream, expand_player_ids, search_players, _make_client
+from .circuit_breaker import CircuitOpen
+from .rate_limit import RateLimited
+from .avatar_cache import avatar_cache, avatar_response, fetch_avatar, make_image, player_avatars
+from .responses import FastJSONResponse
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 
 class IdsPayload(BaseModel):
@@ -23,6 +27,8 @@ async def players_expand(payload: IdsPayload):
     try:
         out = await expand_player_ids(payload.ids, server=payload.server)
         return {'ok': True, 'players': out}
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -32,6 +38,8 @@ async def players_search(payload: SearchPayload):
     try:
         out = await search_players(payload.nickname, server=payload.server, limit=payload.limit)
         return {'ok': True, 'players': out}
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -50,27 +58,44 @@ async def character_detail(player_id: str, server: Optional[str] = 'en'):
         return {'ok': True, 'player': out[0]}
     except HTTPException:
         raise
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get('/avatars/{player_id}')
-async def avatar_proxy(player_id: str, server: Optional[str] = 'en'):
+async def avatar_proxy(player_id: str, request: Request, server: Optional[str] = 'en'):
     """Proxy an avatar image for the requested player id.
 
     This attempts to use the arkprts client to fetch an avatar URL or raw
-    bytes and returns it with the correct content-type. If the arkprts client
-    is unavailable or doesn't provide an avatar, a 404 is returned.
+    bytes and returns it with the correct content-type. Downloads go through
+    a pooled async HTTP client and are cached on disk by avatar id; responses
+    carry an ETag and honor If-None-Match with a 304. Once a player's avatar
+    has been served, repeat requests are answered from the disk cache without
+    an upstream lookup (see `player_avatars`). If the arkprts client is
+    unavailable or doesn't provide an avatar, a 404 is returned.
     """
+    known = player_avatars.get((server, player_id))
+    if known is not None:
+        cached = await avatar_cache.get(known)
+        if cached is not None:
+            return avatar_response(request, cached)
+
+    def serve(key, image):
+        if key:
+            player_avatars.set((server, player_id), key)
+        return avatar_response(request, image)
+
     try:
-        client = _make_client()
+        client = _make_client(server)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f'ark client unavailable: {e}')
 
     # First, try to fetch raw player info which often contains avatar/asset ids
     try:
         if hasattr(client, 'get_raw_player_info'):
-            raw = await client.get_raw_player_info([player_id], server=server)
+            raw = await call_upstream(server, 'player', client.get_raw_player_info, [player_id], server=server)
             # raw may be a dict with 'players' list
             players = None
             if isinstance(raw, dict) and 'players' in raw:
@@ -88,6 +113,12 @@ async def avatar_proxy(player_id: str, server: Optional[str] = 'en'):
                 if not avatar_id:
                     avatar_id = p.get('avatarId') or p.get('avatar')
 
+                cache_key = f'avatar:{avatar_id}' if isinstance(avatar_id, str) else None
+                if cache_key:
+                    cached = await avatar_cache.get(cache_key)
+                    if cached is not None:
+                        return serve(cache_key, cached)
+
                 # try to resolve asset via client.assets
                 assets = getattr(client, 'assets', None)
                 if assets and avatar_id:
@@ -101,26 +132,24 @@ async def avatar_proxy(player_id: str, server: Optional[str] = 'en'):
                                     maybe = await maybe
                                 # if bytes or filepath
                                 if isinstance(maybe, (bytes, bytearray)):
-                                    return Response(content=maybe, media_type='image/png')
+                                    image = make_image(maybe, 'image/png')
+                                    if cache_key:
+                                        await avatar_cache.put(cache_key, image)
+                                    return serve(cache_key, image)
                                 # if resolver returned a path-like or dict with url
-                                if isinstance(maybe, str) and maybe.startswith('http'):
-                                    import httpx
-
-                                    r = httpx.get(maybe, timeout=10.0)
-                                    if r.status_code == 200:
-                                        return Response(content=r.content, media_type=r.headers.get('content-type', 'image/png'))
+                                url = maybe if isinstance(maybe, str) else None
                                 if isinstance(maybe, dict):
                                     # try common keys
                                     url = maybe.get('url') or maybe.get('path')
-                                    if url and isinstance(url, str) and url.startswith('http'):
-                                        import httpx
-
-                                        r = httpx.get(url, timeout=10.0)
-                                        if r.status_code == 200:
-                                            return Response(content=r.content, media_type=r.headers.get('content-type', 'image/png'))
+                                if url and isinstance(url, str) and url.startswith('http'):
+                                    image = await fetch_avatar(url, key=cache_key)
+                                    if image is not None:
+                                        return serve(cache_key or url, image)
                             except Exception:
                                 continue
 
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception:
         # don't fail hard on avatar discovery; fall through to other methods
         pass
@@ -134,18 +163,21 @@ async def avatar_proxy(player_id: str, server: Optional[str] = 'en'):
                 if hasattr(maybe, '__await__'):
                     maybe = await maybe
                 # maybe is bytes or (bytes, content_type) or URL
+                image = None
                 if isinstance(maybe, bytes):
-                    return Response(content=maybe, media_type='image/png')
-                if isinstance(maybe, tuple) and len(maybe) == 2 and isinstance(maybe[0], (bytes, bytearray)):
-                    content_type = maybe[1] or 'application/octet-stream'
-                    return Response(content=maybe[0], media_type=content_type)
+                    image = make_image(maybe, 'image/png')
+                elif isinstance(maybe, tuple) and len(maybe) == 2 and isinstance(maybe[0], (bytes, bytearray)):
+                    image = make_image(maybe[0], maybe[1] or 'application/octet-stream')
+                if image is not None:
+                    # cached per player, since there is no avatar id to share it by
+                    key = f'player:{server}:{player_id}'
+                    await avatar_cache.put(key, image)
+                    return serve(key, image)
                 if isinstance(maybe, str) and maybe.startswith('http'):
                     # simple proxying: fetch the url on the server and return bytes
-                    import httpx
-
-                    r = httpx.get(maybe, timeout=10.0)
-                    if r.status_code == 200:
-                        return Response(content=r.content, media_type=r.headers.get('content-type', 'image/png'))
+                    image = await fetch_avatar(maybe)
+                    if image is not None:
+                        return serve(maybe, image)
             except Exception:
                 continue
 
@@ -160,7 +192,7 @@ async def player_raw(player_id: str, server: Optional[str] = 'en'):
     This is useful for debugging and for UIs that need the complete data
     (avatars, full roster, stats)."""
     try:
-        client = _make_client()
+        client = _make_client(server)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f'ark client unavailable: {e}')
 
@@ -168,8 +200,10 @@ async def player_raw(player_id: str, server: Optional[str] = 'en'):
         raise HTTPException(status_code=501, detail='ark client does not support get_raw_player_info')
 
     try:
-        raw = await client.get_raw_player_info([player_id], server=server)
-        return {'ok': True, 'raw': raw}
+        raw = await call_upstream(server, 'player', client.get_raw_player_info, [player_id], server=server)
+        return FastJSONResponse({'ok': True, 'raw': raw})
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -183,7 +217,7 @@ class RawIdsPayload(BaseModel):
 async def players_raw(payload: RawIdsPayload):
     """Return raw upstream JSON payloads for multiple player ids."""
     try:
-        client = _make_client()
+        client = _make_client(payload.server)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f'ark client unavailable: {e}')
 
@@ -191,7 +225,9 @@ async def players_raw(payload: RawIdsPayload):
         raise HTTPException(status_code=501, detail='ark client does not support get_raw_player_info')
 
     try:
-        raw = await client.get_raw_player_info(payload.ids, server=payload.server)
-        return {'ok': True, 'raw': raw}
+        raw = await call_upstream(payload.server, 'player', client.get_raw_player_info, payload.ids, server=payload.server)
+        return FastJSONResponse({'ok': True, 'raw': raw})
+    except (RateLimited, CircuitOpen):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,164 @@
+"""Token-bucket governor for upstream Yostar/arkprts calls.
+
+Yostar answers with error code 100302 when it is called too often, and the
+limit applies to the whole deployment, so a burst from many users can get
+every caller locked out. Each upstream call first takes a token from the
+bucket for its (server region, operation class). Callers that find the
+bucket empty are queued in arrival order and woken when their token is due.
+Anyone who would have to wait longer than ARK_RATE_MAX_WAIT seconds is
+rejected at once with `RateLimited`, and the routers turn that into a 429.
+
+Operation classes and their `rate:burst` settings (tokens per second and
+bucket size; a rate of 0 disables throttling for that class):
+
+- `auth_code`: email code requests (ARK_RATE_AUTH_CODE)
+- `token`: code-for-token exchange and session logins (ARK_RATE_TOKEN)
+- `data`: logged-in user data fetches (ARK_RATE_DATA)
+- `player`: player search, expand and raw lookups (ARK_RATE_PLAYER)
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Callable
+
+from fastapi import HTTPException
+
+OPERATIONS = ('auth_code', 'token', 'data', 'player')
+
+ARK_RATE_AUTH_CODE = os.getenv('ARK_RATE_AUTH_CODE', '0.1:2')
+ARK_RATE_TOKEN = os.getenv('ARK_RATE_TOKEN', '0.5:3')
+ARK_RATE_DATA = os.getenv('ARK_RATE_DATA', '5:10')
+ARK_RATE_PLAYER = os.getenv('ARK_RATE_PLAYER', '5:20')
+# Longest a caller may be queued for a token before getting a 429
+ARK_RATE_MAX_WAIT = float(os.getenv('ARK_RATE_MAX_WAIT', '10'))
+
+
+def parse_rate(spec: str) -> tuple[float, float]:
+    """Parse '5:10' into (5.0 tokens/s, burst 10.0); the burst defaults to 1."""
+    rate, _, burst = spec.strip().partition(':')
+    return float(rate or 0), max(1.0, float(burst or 1))
+
+
+DEFAULT_LIMITS = {
+    'auth_code': parse_rate(ARK_RATE_AUTH_CODE),
+    'token': parse_rate(ARK_RATE_TOKEN),
+    'data': parse_rate(ARK_RATE_DATA),
+    'player': parse_rate(ARK_RATE_PLAYER),
+}
+
+
+class RateLimited(RuntimeError):
+    """Raised when a caller would wait longer than allowed for a token."""
+
+    def __init__(self, server: str, operation: str, retry_after: float):
+        super().__init__(f'upstream rate limit for {operation} on server={server}; retry in {retry_after:.1f}s')
+        self.server = server
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+def too_many_requests(e: RateLimited) -> HTTPException:
+    """HTTP 429 for a RateLimited error, with a Retry-After header."""
+    return HTTPException(status_code=429, detail=str(e), headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))})
+
+
+class TokenBucket:
+    """Async token bucket whose waiters are served in arrival order.
+
+    A token taken from an empty bucket drives the balance negative; the
+    deficit is the queue ahead of the next caller, so each waiter's delay
+    is fixed when it arrives and later callers can never overtake it.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float | None:
+        """Take a token and return the seconds until it is due, or None if over `max_wait`."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        wait = max(0.0, (1 - self._tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self._tokens -= 1
+        return wait
+
+    def cancel(self) -> None:
+        """Return a reserved token whose caller gave up waiting."""
+        self._tokens += 1
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Wait for a token; False (without consuming one) if it is more than `max_wait` away."""
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.cancel()
+                raise
+        return True
+
+    def retry_after(self) -> float:
+        """Seconds until a new caller would get a token."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class RateGovernor:
+    """Token buckets per (server region, operation class), created on first use."""
+
+    def __init__(self, limits: dict[str, tuple[float, float]] | None = None, max_wait: float = ARK_RATE_MAX_WAIT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._rejected = 0
+
+    def bucket(self, server: str, operation: str) -> TokenBucket:
+        key = (server, operation)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if operation not in self.limits:
+                raise ValueError(f'unknown upstream operation {operation!r}')
+            rate, burst = self.limits[operation]
+            bucket = self._buckets[key] = TokenBucket(rate, burst, clock=self._clock)
+        return bucket
+
+    async def acquire(self, server: str, operation: str, max_wait: float | None = None) -> None:
+        """Wait for permission to make one `operation` call to `server`.
+
+        Raises RateLimited if the wait would exceed `max_wait` (capped at the
+        governor's own `max_wait`).
+        """
+        bucket = self.bucket(server, operation)
+        limit = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        if not await bucket.acquire(limit):
+            self._rejected += 1
+            raise RateLimited(server, operation, bucket.retry_after())
+
+    def stats(self) -> dict:
+        """Return the number of rejected calls and the tokens left per bucket."""
+        return {
+            'rejected': self._rejected,
+            'buckets': {f'{server}/{op}': round(b._tokens, 2) for (server, op), b in self._buckets.items()},
+        }
+
+
+governor = RateGovernor()
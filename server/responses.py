@@ -0,0 +1,158 @@
+"""JSON response classes for the REST routers.
+
+`FastJSONResponse` renders with orjson when it is installed (falling back
+to the stdlib encoder) and is the routers' default response class.
+FastAPI still runs `jsonable_encoder` over plain dict return values, so
+endpoints with large payloads return a response object directly.
+
+`encoded_bodies` memoizes encoded bytes per cached source object (a
+user-data snapshot), so repeat hits skip encoding entirely.
+`fixture_responses` holds fixture-derived bodies with a strong ETag per
+(endpoint, normalized params), dropped whenever the fixture version
+changes. Both hand out `EncodedBody` objects, whose gzip/brotli variants
+are compressed once and kept alongside; `body_response` negotiates the
+encoding and answers conditional GETs with 304.
+"""
+
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from typing import Any, Callable, Hashable
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from .cache import TTLCache
+from .compression import EncodedBody
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# Encoded bodies are kept about as long as the snapshots they are built from
+ENCODED_TTL = float(os.getenv('ENCODED_RESPONSE_TTL', os.getenv('ARK_USER_DATA_TTL', '30')))
+ENCODED_MAXSIZE = int(os.getenv('ENCODED_RESPONSE_MAXSIZE', '128'))
+# Distinct fixture responses (endpoint + params) kept per fixture version
+FIXTURE_RESPONSE_MAXSIZE = int(os.getenv('FIXTURE_RESPONSE_MAXSIZE', '512'))
+
+
+def _default(obj: Any) -> Any:
+    # read-only views (MappingProxyType, RosterEntry) and other containers
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedJSONResponse(Response):
+    """Response whose body is already-encoded JSON bytes."""
+
+    media_type = 'application/json'
+
+
+class EncodedBodies:
+    """Encoded JSON bodies memoized per (source object, tag).
+
+    An entry is only reused while its source is the very same object, so a
+    new snapshot (or a fixture reload) is always re-encoded. Entries hold a
+    reference to their source for at most `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = ENCODED_MAXSIZE, ttl: float = ENCODED_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, source: Any, tag: Hashable, build: Callable[[], Any]) -> EncodedBody:
+        """Return the encoded body of `build()`, reusing it while `source` is unchanged."""
+        key = (id(source), tag)
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] is source:
+            return hit[1]
+        body = EncodedBody(dumps(build()))
+        self._cache.set(key, (source, body))
+        return body
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+encoded_bodies = EncodedBodies()
+
+
+class VersionedBodies:
+    """Encoded bodies with strong ETags, valid for one data version.
+
+    `get(version, key, build)` encodes `build()` once per key; all entries
+    are dropped when a different `version` is seen. Least recently used
+    keys are evicted past `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = FIXTURE_RESPONSE_MAXSIZE):
+        self._version: Any = None
+        self._cache = TTLCache(maxsize=maxsize, ttl=float('inf'))
+
+    def get(self, version: Any, key: Hashable, build: Callable[[], Any]) -> EncodedBody:
+        """Return the ETag'd body for `key` at `version`."""
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+        hit = self._cache.get(key)
+        if hit is None:
+            content = dumps(build())
+            hit = EncodedBody(content, etag='"%s"' % hashlib.sha256(content).hexdigest())
+            self._cache.set(key, hit)
+        return hit
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+fixture_responses = VersionedBodies()
+
+
+def etag_matches(request: Request, *etags: str) -> bool:
+    """True when the request's If-None-Match covers any of `etags`."""
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    return any(etag in tags for etag in etags)
+
+
+def body_response(request: Request, body: EncodedBody) -> Response:
+    """Send a cached body in the client's preferred Content-Encoding.
+
+    ETag'd bodies must be revalidated (`no-cache`) and get a 304 for a
+    matching conditional GET; each encoding has its own ETag.
+    """
+    content, encoding = body.choose(request.headers.get('accept-encoding', ''))
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    if body.etag is not None:
+        etag = body.variant_etag(encoding)
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'no-cache'
+        if request.method in ('GET', 'HEAD') and etag_matches(request, etag, body.etag):
+            return Response(status_code=304, headers=headers)
+    return EncodedJSONResponse(content, headers=headers)
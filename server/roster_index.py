@@ -0,0 +1,242 @@
+"""Compact, filterable operator roster (`user.troop.chars`).
+
+A roster snapshot is stored column-wise: integer stats live in
+`array('q')` columns, strings and nested data (skills, equip) in plain
+lists that reference the parsed objects. Nothing per-operator carries a
+`__dict__`; `RosterEntry` is a slotted read-only view over one row, and
+response objects (GraphQL `Operator`, REST dicts) are built from rows
+only when a request serializes them.
+
+Every other key of an entry, and values of the integer keys that are not
+plain ints, go to a per-row `extras` dict (None for the usual row that has
+none), so a row reads back exactly as parsed. `RosterIndex.chars()` is a
+read-only view keyed like the source mapping (`instId -> entry`); cached
+user-data snapshots hold it in place of the raw `troop.chars` dicts.
+
+Range filters on level, evolvePhase (elite) and potentialRank are
+answered by bisecting sorted key arrays, built on first use, and `ids`
+and by-id lookups by a charId -> row map, so a query only touches the
+operators it returns.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from itertools import chain
+from typing import Any, Iterable, Iterator, Optional
+
+# filter field -> raw roster key
+RANGE_FIELDS = {
+    'level': 'level',
+    'elite': 'evolvePhase',
+    'potential': 'potentialRank',
+}
+
+# raw keys stored in int64 columns / in object columns
+INT_KEYS = (
+    'instId', 'level', 'exp', 'evolvePhase', 'potentialRank', 'mainSkillLvl',
+    'favorPoint', 'gainTime', 'defaultSkillIndex',
+)
+# starMark and the tmpl pair are on a few operators only
+OBJECT_KEYS = ('skin', 'currentEquip', 'skills', 'equip', 'voiceLan', 'starMark', 'currentTmpl', 'tmpl')
+
+_COLUMN_KEYS = frozenset(('charId', *INT_KEYS, *OBJECT_KEYS))
+
+# marks an absent key (or one kept in `extras`) in an int column
+_ABSENT = -(2 ** 63)
+_MISSING = object()
+
+
+class RosterEntry(Mapping):
+    """Read-only view of one roster row, usable like the raw entry dict."""
+
+    __slots__ = ('_roster', '_pos')
+
+    def __init__(self, roster: 'RosterIndex', pos: int):
+        self._roster = roster
+        self._pos = pos
+
+    def _lookup(self, key: str) -> Any:
+        roster = self._roster
+        if key == 'charId':
+            return roster.char_ids[self._pos]
+        column = roster.int_columns.get(key)
+        if column is not None:
+            value = column[self._pos]
+            if value != _ABSENT:
+                return value
+        else:
+            column = roster.object_columns.get(key)
+            if column is not None:
+                return column[self._pos]
+        extras = roster.extras[self._pos]
+        return _MISSING if extras is None else extras.get(key, _MISSING)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._lookup(key) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        extras = self._roster.extras[self._pos]
+        columns = (key for key in ('charId', *INT_KEYS, *OBJECT_KEYS) if key in self)
+        if extras is None:
+            return columns
+        return chain(columns, (key for key in extras if key not in _COLUMN_KEYS))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f'RosterEntry({self.get("charId")!r})'
+
+
+class RosterChars(Mapping):
+    """Read-only `key -> RosterEntry` view in the source mapping's order."""
+
+    __slots__ = ('_roster',)
+
+    def __init__(self, roster: 'RosterIndex'):
+        self._roster = roster
+
+    def __getitem__(self, key: str) -> RosterEntry:
+        return RosterEntry(self._roster, self._roster.by_key[key])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._roster.by_key
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._roster.by_key)
+
+    def __len__(self) -> int:
+        return len(self._roster.by_key)
+
+    def __repr__(self) -> str:
+        return f'RosterChars({len(self)} operators)'
+
+
+class RosterIndex:
+    """Column-backed roster in roster order, plus lazy sorted indexes."""
+
+    def __init__(self, chars: Mapping[str, Mapping]):
+        entries = list(chars.values())
+        self.by_key: dict[str, int] = {key: pos for pos, key in enumerate(chars)}
+        self.char_ids: list[str] = [entry.get('charId', '') for entry in entries]
+        self.int_columns: dict[str, array] = {
+            key: array('q', (_int_or_absent(entry.get(key)) for entry in entries))
+            for key in INT_KEYS
+        }
+        self.extras: list[Optional[dict]] = [_extras(entry) for entry in entries]
+        self.object_columns: dict[str, list] = {
+            key: [entry.get(key, _MISSING) for entry in entries]
+            for key in OBJECT_KEYS
+        }
+        self.by_id: dict[str, int] = {}
+        for pos, char_id in enumerate(self.char_ids):
+            self.by_id.setdefault(char_id, pos)
+        # field -> (sorted values, positions in the same order)
+        self._sorted: dict[str, tuple[array, array]] = {}
+        self._chars = RosterChars(self)
+
+    def __len__(self) -> int:
+        return len(self.char_ids)
+
+    def chars(self) -> RosterChars:
+        """Return the read-only `key -> entry` view of the source mapping."""
+        return self._chars
+
+    def value(self, key: str, pos: int, default: int = 0) -> int:
+        """Integer stat `key` of row `pos`, or `default` when absent."""
+        value = self.int_columns[key][pos]
+        return default if value == _ABSENT else value
+
+    def get(self, char_id: str) -> Optional[RosterEntry]:
+        """Return the entry for `char_id`, or None."""
+        pos = self.by_id.get(char_id)
+        return None if pos is None else RosterEntry(self, pos)
+
+    def get_many(self, char_ids: Iterable[str]) -> list[RosterEntry]:
+        """Return entries for `char_ids` in request order, skipping unknown ids."""
+        by_id = self.by_id
+        return [RosterEntry(self, by_id[i]) for i in char_ids if i in by_id]
+
+    def _sorted_index(self, field: str) -> tuple[array, array]:
+        index = self._sorted.get(field)
+        if index is None:
+            key = RANGE_FIELDS[field]
+            pairs = sorted((self.value(key, pos), pos) for pos in range(len(self)))
+            index = (array('q', (v for v, _ in pairs)), array('q', (p for _, p in pairs)))
+            self._sorted[field] = index
+        return index
+
+    def _range(self, field: str, low: Optional[int], high: Optional[int]) -> set[int]:
+        values, positions = self._sorted_index(field)
+        start = 0 if low is None else bisect_left(values, low)
+        stop = len(values) if high is None else bisect_right(values, high)
+        return set(positions[start:stop])
+
+    def filter(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        min_level: Optional[int] = None,
+        max_level: Optional[int] = None,
+        min_elite: Optional[int] = None,
+        max_elite: Optional[int] = None,
+        min_potential: Optional[int] = None,
+    ) -> list[RosterEntry]:
+        """Return matching entries in roster order.
+
+        Mirrors the resolvers' historical semantics: an empty `ids` and a
+        `min_level`/`max_level` of 0 mean "no filter".
+        """
+        selected: Optional[set[int]] = None
+        if ids:
+            selected = {self.by_id[i] for i in ids if i in self.by_id}
+
+        ranges = (
+            ('level', min_level or None, max_level or None),
+            ('elite', min_elite, max_elite),
+            ('potential', min_potential, None),
+        )
+        for field, low, high in ranges:
+            if low is None and high is None:
+                continue
+            # narrow small selections directly instead of building a range set
+            if selected is not None and len(selected) <= 32:
+                key = RANGE_FIELDS[field]
+                selected = {
+                    pos for pos in selected
+                    if (low is None or self.value(key, pos) >= low)
+                    and (high is None or self.value(key, pos) <= high)
+                }
+            else:
+                matched = self._range(field, low, high)
+                selected = matched if selected is None else selected & matched
+
+        if selected is None:
+            return [RosterEntry(self, pos) for pos in range(len(self))]
+        return [RosterEntry(self, pos) for pos in sorted(selected)]
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int and _ABSENT < value < 2 ** 63
+
+
+def _int_or_absent(value: Any) -> int:
+    return value if _is_int(value) else _ABSENT
+
+
+def _extras(entry: Mapping) -> Optional[dict]:
+    extras = {
+        key: value for key, value in entry.items()
+        if key not in _COLUMN_KEYS or (key in INT_KEYS and not _is_int(value))
+    }
+    return extras or None
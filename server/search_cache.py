@@ -0,0 +1,98 @@
+"""Per-region cache for player nickname searches.
+
+The UI searches as the user types, so consecutive queries are usually
+prefixes of each other ("A", "Am", "Ami", "Amiy"). Results are cached
+per region by normalized nickname (whitespace collapsed, case-folded) and
+limit. A result with fewer players than its limit is complete: every
+player whose name starts with the query is in it. That result can answer
+the same query at any limit, and any longer query by filtering names, so
+"Amiy" is served from a cached "Ami" without an upstream call.
+
+Truncated results (as many players as the limit) only answer the same
+query with the same or a smaller limit. Queries with a '#' (nickname plus
+number) are cached exactly but are never answered from a prefix.
+Cached lists and dicts are shared between callers and must not be mutated.
+"""
+
+import os
+import time
+from typing import Callable, Optional
+
+from .cache import TTLCache
+
+SEARCH_CACHE_TTL = float(os.getenv('ARK_SEARCH_CACHE_TTL', '120'))
+SEARCH_CACHE_MAXSIZE = int(os.getenv('ARK_SEARCH_CACHE_MAXSIZE', '512'))
+
+
+def normalize_nickname(nickname: str) -> str:
+    """Collapse whitespace and case-fold a search query."""
+    return ' '.join(nickname.split()).casefold()
+
+
+def _name_matches(player: dict, query: str) -> bool:
+    name = player.get('name')
+    return isinstance(name, str) and normalize_nickname(name).startswith(query)
+
+
+class SearchCache:
+    """Search results per (region, normalized nickname), with prefix reuse."""
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_MAXSIZE, ttl: float = SEARCH_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        # (server, query) -> complete results, and -> (limit, results) for the
+        # largest truncated result seen
+        self._complete = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._truncated = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def get(self, server: str, nickname: str, limit: Optional[int]) -> Optional[list]:
+        """Return cached results for the search, or None if upstream must be asked."""
+        query = normalize_nickname(nickname)
+        complete = self._complete.get((server, query))
+        if complete is not None:
+            self.hits += 1
+            return complete[:limit]
+
+        truncated = self._truncated.get((server, query))
+        if truncated is not None and limit is not None and truncated[0] >= limit:
+            self.hits += 1
+            return truncated[1][:limit]
+
+        if query and '#' not in query:
+            for end in range(len(query) - 1, 0, -1):
+                prefix = self._complete.get((server, query[:end]))
+                if prefix is not None:
+                    self.prefix_hits += 1
+                    # not stored: it would outlive the entry it was filtered from
+                    return [p for p in prefix if _name_matches(p, query)][:limit]
+
+        self.misses += 1
+        return None
+
+    def set(self, server: str, nickname: str, limit: Optional[int], results: list) -> None:
+        """Store the upstream results for a search."""
+        query = normalize_nickname(nickname)
+        if limit is None or len(results) < limit:
+            self._complete.set((server, query), results)
+        else:
+            previous = self._truncated.get((server, query))
+            if previous is None or previous[0] <= limit:
+                self._truncated.set((server, query), (limit, results))
+
+    def clear(self) -> None:
+        self._complete.clear()
+        self._truncated.clear()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'prefixHits': self.prefix_hits,
+            'misses': self.misses,
+            'size': len(self._complete) + len(self._truncated),
+            'ttl': self._complete.ttl,
+        }
+
+
+search_cache = SearchCache()
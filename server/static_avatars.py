@@ -0,0 +1,111 @@
+"""Serve the bundled operator avatars (data/avatars) straight from the API.
+
+Files are streamed in chunks with FileResponse (the Starlette and uvicorn
+versions in use have no sendfile path). They never change between deploys,
+so responses carry a strong content-hash ETag and `Cache-Control:
+immutable`. When a `.webp` sibling
+of a PNG exists and the client accepts WebP, the WebP variant is served.
+PNG/WebP are already compressed, so no gzip/brotli variants are kept.
+"""
+
+import asyncio
+import hashlib
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from .responses import etag_matches
+
+router = APIRouter()
+
+AVATARS_DIR = os.getenv('AVATARS_DIR') or str(Path(__file__).parent.parent / 'data' / 'avatars')
+
+MEDIA_TYPES = {'.png': 'image/png', '.webp': 'image/webp'}
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class AvatarFile(NamedTuple):
+    path: Path
+    media_type: str
+    etag: str
+    stat: os.stat_result
+
+
+class StaticAvatars:
+    """Index of avatar files by character id, with memoized content ETags."""
+
+    def __init__(self, directory: str = AVATARS_DIR):
+        self.directory = Path(directory)
+        self._files: Optional[dict[str, dict[str, Path]]] = None
+        # path -> (mtime_ns, size, etag)
+        self._etags: dict[Path, tuple[int, int, str]] = {}
+
+    def variants(self, char_id: str) -> dict[str, Path]:
+        """Return the available files for `char_id` keyed by suffix."""
+        if self._files is None:
+            files: dict[str, dict[str, Path]] = {}
+            if self.directory.is_dir():
+                for entry in os.scandir(self.directory):
+                    path = Path(entry.path)
+                    if entry.is_file() and path.suffix.lower() in MEDIA_TYPES:
+                        files.setdefault(path.stem, {})[path.suffix.lower()] = path
+            self._files = files
+        return self._files.get(char_id, {})
+
+    async def lookup(self, char_id: str, accept: str = '') -> Optional[AvatarFile]:
+        """Pick the best variant for the Accept header and return it with its ETag."""
+        variants = self.variants(char_id)
+        if '.webp' in variants and 'image/webp' in accept:
+            path = variants['.webp']
+        else:
+            path = variants.get('.png') or variants.get('.webp')
+        if path is None:
+            return None
+        stat, etag = await asyncio.to_thread(self._stat_and_etag, path)
+        return AvatarFile(path=path, media_type=MEDIA_TYPES[path.suffix.lower()], etag=etag, stat=stat)
+
+    def _stat_and_etag(self, path: Path) -> tuple[os.stat_result, str]:
+        # runs in a worker thread: stat (and hashing, when the file changed) hit the disk
+        stat = path.stat()
+        cached = self._etags.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return stat, cached[2]
+        etag = '"%s"' % hashlib.sha256(path.read_bytes()).hexdigest()
+        self._etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+        return stat, etag
+
+
+static_avatars = StaticAvatars()
+
+
+@router.get('/operator-avatars/{name}')
+async def operator_avatar(name: str, request: Request):
+    """Return the bundled avatar for an operator (e.g. `char_002_amiya.png`).
+
+    The suffix is optional; a WebP variant is preferred when present and
+    accepted by the client.
+    """
+    char_id = name
+    for suffix in MEDIA_TYPES:
+        if name.lower().endswith(suffix):
+            char_id = name[:-len(suffix)]
+            break
+
+    avatar = await static_avatars.lookup(char_id, request.headers.get('accept', ''))
+    if avatar is None:
+        raise HTTPException(status_code=404, detail=f'avatar {char_id} not found')
+
+    headers = {
+        'ETag': avatar.etag,
+        'Cache-Control': CACHE_CONTROL,
+        'Vary': 'Accept',
+    }
+    if etag_matches(request, avatar.etag):
+        headers['Last-Modified'] = formatdate(avatar.stat.st_mtime, usegmt=True)
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(avatar.path, media_type=avatar.media_type, headers=headers, stat_result=avatar.stat)
@@ -0,0 +1,50 @@
+"""Shared fixtures for the server tests."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from unittest.mock import patch
+
+from server import ark_client, players
+from server.avatar_cache import AvatarDiskCache
+from server.cache import TTLCache
+from server.player_directory import PlayerDirectory
+
+
+@pytest.fixture(autouse=True)
+def empty_player_directory():
+    """Give each test its own in-memory player directory.
+
+    Otherwise players recorded by one test (or a previous run, on disk)
+    would answer lookups in the next.
+    """
+    directory = PlayerDirectory(':memory:')
+    with patch.object(ark_client, 'player_directory', directory):
+        yield directory
+    directory.close()
+
+
+@pytest.fixture(autouse=True)
+def empty_avatar_cache(tmp_path):
+    """Give each test its own avatar disk cache and player -> avatar map."""
+    with patch.object(players, 'avatar_cache', AvatarDiskCache(str(tmp_path / 'avatars'))), \
+            patch.object(players, 'player_avatars', TTLCache(maxsize=64, ttl=60)):
+        yield
+
+
+class FakeClock:
+    """Manually advanced clock for TTL, rate and breaker tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at 0; set `clock.now` to move time."""
+    return FakeClock()
@@ -0,0 +1,350 @@
+"""Tests for arkprts client helpers in server/ark_client.py."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from server import ark_client
+from server.ark_client import ClientRegistry
+from server.circuit_breaker import CircuitBreakers
+from server.rate_limit import OPERATIONS, RateGovernor, RateLimited
+
+
+class FakeClient:
+    """Minimal stand-in for arkprts.Client."""
+
+    def __init__(self, assets=None, server=None, auth=None):
+        self.server = server
+        self.auth = auth
+        if auth is not None:
+            self.network = auth.network
+        else:
+            self.network = Mock()
+            self.network.close = AsyncMock()
+            self.network.load_network_config = AsyncMock()
+        self.get_raw_data = AsyncMock(return_value={'user': {'status': {'nickName': 'Doctor'}}})
+
+
+@pytest.fixture
+def fake_arkprts():
+    """Patch arkprts with fakes and give each test fresh, unthrottled client/session caches."""
+    async def from_token(server, channel_uid, token, network=None):
+        return Mock(network=network, channel_uid=channel_uid)
+
+    fake = Mock()
+    fake.Client = FakeClient
+    fake.YostarAuth.from_token = AsyncMock(side_effect=from_token)
+    with patch.object(ark_client, 'arkprts', fake), \
+            patch.object(ark_client, 'clients', ClientRegistry()), \
+            patch.object(ark_client, '_sessions', ark_client.TTLCache(maxsize=8, ttl=60)), \
+            patch.object(ark_client, '_user_data', ark_client.CoalescingCache(maxsize=8, ttl=0)), \
+            patch.object(ark_client, 'governor', RateGovernor(limits={op: (0, 1) for op in OPERATIONS})), \
+            patch.object(ark_client, 'breakers', CircuitBreakers()):
+        yield fake
+
+
+class TestClientRegistry:
+    """Tests for the per-region client registry."""
+
+    @patch('server.ark_client._require_client_class', return_value=FakeClient)
+    async def test_reuses_client_per_server(self, _):
+        """Test that the same client is returned for repeated lookups."""
+        registry = ClientRegistry()
+
+        en = registry.get('en')
+        assert registry.get('en') is en
+        assert registry.get('jp') is not en
+        assert registry.get('jp').server == 'jp'
+
+    @patch('server.ark_client._require_client_class', return_value=FakeClient)
+    async def test_aclose_closes_networks(self, _):
+        """Test that closing the registry closes every network session."""
+        registry = ClientRegistry()
+        en = registry.get('en')
+        jp = registry.get('jp')
+
+        await registry.aclose()
+
+        en.network.close.assert_awaited_once()
+        jp.network.close.assert_awaited_once()
+        assert registry.get('en') is not en
+
+    @patch('server.ark_client._require_client_class', return_value=FakeClient)
+    async def test_warm_loads_network_config(self, _):
+        """Test that warming preloads network config and tolerates failures."""
+        registry = ClientRegistry()
+        registry.get('jp').network.load_network_config.side_effect = RuntimeError('offline')
+
+        await registry.warm(['en', 'jp'])
+
+        registry.get('en').network.load_network_config.assert_awaited_once_with('en')
+
+    @patch('server.ark_client._require_client_class', return_value=FakeClient)
+    def test_new_event_loop_gets_new_clients(self, _):
+        """Test that clients created on another event loop are not reused."""
+        import asyncio
+
+        registry = ClientRegistry()
+
+        async def lookup():
+            return registry.get('en')
+
+        first = asyncio.run(lookup())
+        second = asyncio.run(lookup())
+        assert first is not second
+
+
+class TestSessionCache:
+    """Tests for reuse of authenticated sessions in get_user_data."""
+
+    async def test_repeat_calls_reuse_login(self, fake_arkprts):
+        """Test that the second call with the same credentials skips login."""
+        first = await ark_client.get_user_data('uid', 'token', 'en')
+        second = await ark_client.get_user_data('uid', 'token', 'en')
+
+        assert first == second
+        assert fake_arkprts.YostarAuth.from_token.await_count == 1
+
+    async def test_sessions_are_keyed_by_credentials(self, fake_arkprts):
+        """Test that different tokens or servers get their own sessions."""
+        await ark_client.get_user_data('uid', 'token', 'en')
+        await ark_client.get_user_data('uid', 'other', 'en')
+        await ark_client.get_user_data('uid', 'token', 'jp')
+
+        assert fake_arkprts.YostarAuth.from_token.await_count == 3
+
+    async def test_session_shares_region_network(self, fake_arkprts):
+        """Test that logged-in clients reuse the region's network session."""
+        await ark_client.get_user_data('uid', 'token', 'en')
+
+        kwargs = fake_arkprts.YostarAuth.from_token.await_args.kwargs
+        assert kwargs['network'] is ark_client.clients.network('en')
+
+    async def test_failed_cached_session_is_retried_with_fresh_login(self, fake_arkprts):
+        """Test that a stale cached session is dropped and login is redone."""
+        await ark_client.get_user_data('uid', 'token', 'en')
+        stale = await ark_client._get_session_client('uid', 'token', 'en')
+        stale.get_raw_data.side_effect = RuntimeError('session expired')
+
+        data = await ark_client.get_user_data('uid', 'token', 'en')
+
+        assert data['user']['status']['nickName'] == 'Doctor'
+        assert fake_arkprts.YostarAuth.from_token.await_count == 2
+
+    async def test_fresh_login_failure_is_raised(self, fake_arkprts):
+        """Test that errors from a fresh session propagate without retry."""
+        fake_arkprts.YostarAuth.from_token.side_effect = RuntimeError('bad token')
+
+        with pytest.raises(RuntimeError):
+            await ark_client.get_user_data('uid', 'token', 'en')
+        assert fake_arkprts.YostarAuth.from_token.await_count == 1
+
+
+class TestUserDataSnapshots:
+    """Tests for the user-data snapshot cache in get_user_data."""
+
+    async def test_snapshot_is_reused_within_ttl(self, fake_arkprts):
+        """Test that a cached snapshot avoids a second upstream fetch."""
+        with patch.object(ark_client, '_user_data', ark_client.CoalescingCache(maxsize=8, ttl=60)):
+            await ark_client.get_user_data('uid', 'token', 'en')
+            await ark_client.get_user_data('uid', 'token', 'en')
+            client = await ark_client._get_session_client('uid', 'token', 'en')
+
+            assert client.get_raw_data.await_count == 1
+            stats = ark_client.user_data_cache_stats()
+            assert stats['hits'] == 1
+            assert stats['misses'] == 1
+
+    async def test_concurrent_calls_share_one_fetch(self, fake_arkprts):
+        """Test that simultaneous roster and status calls coalesce."""
+        import asyncio
+
+        roster, status = await asyncio.gather(
+            ark_client.get_user_data('uid', 'token', 'en'),
+            ark_client.get_user_data('uid', 'token', 'en'),
+        )
+
+        assert roster is status
+        assert fake_arkprts.YostarAuth.from_token.await_count == 1
+        assert ark_client.user_data_cache_stats()['coalesced'] == 1
+
+
+class TestUserDataProjection:
+    """Tests for trimming user data to the configured sections."""
+
+    BLOB = {
+        'result': 0,
+        'user': {
+            'troop': {'chars': {'1': {'charId': 'char_a'}}, 'squads': {'0': {}}},
+            'status': {'nickName': 'Doctor'},
+            'dungeon': {'stages': {}},
+            'building': {'rooms': {}},
+        },
+    }
+
+    def test_keeps_only_whitelisted_paths(self):
+        """Test that only the listed dotted paths survive."""
+        paths = ark_client.parse_sections('troop.chars, status')
+
+        assert ark_client.project_user_data(self.BLOB, paths) == {
+            'user': {
+                'troop': {'chars': {'1': {'charId': 'char_a'}}},
+                'status': {'nickName': 'Doctor'},
+            },
+        }
+
+    def test_missing_sections_are_skipped(self):
+        """Test that absent sections don't create empty keys."""
+        paths = ark_client.parse_sections('status,inventory.items')
+
+        assert ark_client.project_user_data(self.BLOB, paths) == {'user': {'status': {'nickName': 'Doctor'}}}
+
+    def test_wildcard_keeps_everything(self):
+        """Test that '*' or an empty whitelist disables projection."""
+        assert ark_client.parse_sections('*') is None
+        assert ark_client.parse_sections('') is None
+        assert ark_client.project_user_data(self.BLOB, None) is self.BLOB
+
+    async def test_projection_is_applied_before_caching(self, fake_arkprts):
+        """Test that get_user_data returns (and caches) the trimmed blob."""
+        client = await ark_client._get_session_client('uid', 'token', 'en')
+        client.get_raw_data.return_value = self.BLOB
+
+        with patch.object(ark_client, '_USER_DATA_PATHS', [('status',)]):
+            data = await ark_client.get_user_data('uid', 'token', 'en')
+
+        assert data == {'user': {'status': {'nickName': 'Doctor'}}}
+
+    async def test_cached_roster_is_column_backed(self, fake_arkprts):
+        """Test that the cached snapshot holds troop.chars as a RosterIndex view."""
+        from server.roster_index import RosterChars
+
+        client = await ark_client._get_session_client('uid', 'token', 'en')
+        client.get_raw_data.return_value = self.BLOB
+
+        data = await ark_client.get_user_data('uid', 'token', 'en')
+        chars = data['user']['troop']['chars']
+
+        assert isinstance(chars, RosterChars)
+        assert {key: dict(entry) for key, entry in chars.items()} == self.BLOB['user']['troop']['chars']
+        assert ark_client._stale_user_data.get(ark_client.credential_key('uid', 'token', 'en')) is data
+
+
+class SlowLookupClient:
+    """Client exposing only a per-id lookup with configurable delays."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_player(self, pid, server=None):
+        import asyncio
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(pid, 0.01))
+            return Mock(uid=pid, nickname=f'Doctor{pid}', level=int(pid))
+        finally:
+            self.in_flight -= 1
+
+
+class TestExpandPlayerIds:
+    """Tests for concurrent per-id fallback in expand_player_ids."""
+
+    async def test_fallback_preserves_input_order(self):
+        """Test that results come back in input order despite varying latency."""
+        client = SlowLookupClient({'1': 0.05, '2': 0.0, '3': 0.02})
+        with patch.object(ark_client, '_make_client', return_value=client):
+            out = await ark_client.expand_player_ids(['1', '2', '3'])
+
+        assert [p['id'] for p in out] == ['1', '2', '3']
+        assert out[0] == {'id': '1', 'name': 'Doctor1', 'level': 1}
+
+    async def test_fallback_respects_concurrency_limit(self):
+        """Test that no more than EXPAND_CONCURRENCY lookups run at once."""
+        client = SlowLookupClient()
+        ids = [str(i) for i in range(1, 11)]
+        with patch.object(ark_client, '_make_client', return_value=client), \
+                patch.object(ark_client, 'EXPAND_CONCURRENCY', 3):
+            out = await ark_client.expand_player_ids(ids)
+
+        assert len(out) == 10
+        assert 1 < client.max_in_flight <= 3
+
+    async def test_slow_id_is_dropped_after_deadline(self):
+        """Test that one slow id does not stall the rest of the batch."""
+        client = SlowLookupClient({'2': 5.0})
+        with patch.object(ark_client, '_make_client', return_value=client), \
+                patch.object(ark_client, 'EXPAND_ID_TIMEOUT', 0.1):
+            out = await ark_client.expand_player_ids(['1', '2', '3'])
+
+        assert [p['id'] for p in out] == ['1', '3']
+
+    async def test_duplicate_ids_are_resolved_once(self):
+        """Test that repeated ids produce a single lookup and summary."""
+        client = SlowLookupClient()
+        client.get_player = AsyncMock(side_effect=client.get_player)
+        with patch.object(ark_client, '_make_client', return_value=client):
+            out = await ark_client.expand_player_ids(['1', '2', '1', '2'])
+
+        assert [p['id'] for p in out] == ['1', '2']
+        assert client.get_player.await_count == 2
+
+    async def test_only_ids_missing_from_bulk_fall_back(self):
+        """Test that ids returned by get_players are not looked up again."""
+        client = SlowLookupClient()
+        client.get_players = AsyncMock(return_value=[Mock(uid='1', nickname='Bulk', level=1)])
+        client.get_player = AsyncMock(side_effect=client.get_player)
+        with patch.object(ark_client, '_make_client', return_value=client):
+            out = await ark_client.expand_player_ids(['1', '2'])
+
+        assert [p['name'] for p in out] == ['Bulk', 'Doctor2']
+        client.get_player.assert_awaited_once_with('2', server='en')
+
+    async def test_refused_lookup_cancels_the_others(self):
+        """Test that a rate-limited id stops the lookups still in flight."""
+        client = SlowLookupClient({'1': 1.0, '2': 1.0})
+        acquired = []
+
+        async def acquire(server, operation, max_wait=None):
+            acquired.append(operation)
+            if len(acquired) == 3:
+                raise RateLimited(server, operation, 1.0)
+
+        with patch.object(ark_client, '_make_client', return_value=client), \
+                patch.object(ark_client, 'governor', Mock(acquire=AsyncMock(side_effect=acquire))), \
+                patch.object(ark_client, 'breakers', CircuitBreakers()), \
+                patch.object(ark_client, 'EXPAND_CONCURRENCY', 3):
+            with pytest.raises(RateLimited):
+                await ark_client.expand_player_ids(['1', '2', '3'])
+
+        assert client.in_flight == 0
+        assert len(acquired) == 3
+
+    async def test_throttled_lookup_is_refused_not_dropped(self):
+        """Test that an id whose token is past the per-id deadline raises RateLimited."""
+        client = SlowLookupClient({str(i): 0.0 for i in range(6)})
+        with patch.object(ark_client, '_make_client', return_value=client), \
+                patch.object(ark_client, 'governor', RateGovernor(limits={'player': (1, 2)}, max_wait=10)), \
+                patch.object(ark_client, 'breakers', CircuitBreakers()), \
+                patch.object(ark_client, 'EXPAND_ID_TIMEOUT', 1):
+            with pytest.raises(RateLimited):
+                await ark_client.expand_player_ids([str(i) for i in range(6)])
+
+    def test_capabilities_are_probed_once_per_class(self):
+        """Test that the method probe is cached by client class."""
+        first = ark_client._client_capabilities(SlowLookupClient())
+        ark_client._capabilities[SlowLookupClient] = (('get_player',), True)
+
+        assert first == (('get_player',), False)
+        assert ark_client._client_capabilities(SlowLookupClient()) == (('get_player',), True)
+        del ark_client._capabilities[SlowLookupClient]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
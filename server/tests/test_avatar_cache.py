@@ -0,0 +1,117 @@
+"""Tests for avatar fetching, disk caching and conditional responses."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi.testclient import TestClient
+
+from server import avatar_cache as avatar_mod
+from server.avatar_cache import AvatarDiskCache, make_image
+from server.main import app
+
+client = TestClient(app)
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+class TestAvatarDiskCache:
+    """Tests for the on-disk avatar cache."""
+
+    async def test_put_then_get_round_trip(self, tmp_path):
+        """Test that a stored image is read back with its metadata."""
+        cache = AvatarDiskCache(tmp_path, max_bytes=1024 * 1024)
+        image = make_image(PNG, 'image/png')
+
+        await cache.put('avatar:1', image)
+        cached = await cache.get('avatar:1')
+
+        assert cached == image
+        assert await cache.get('avatar:2') is None
+
+    async def test_index_survives_restart(self, tmp_path):
+        """Test that a new cache instance finds previously stored files."""
+        await AvatarDiskCache(tmp_path).put('avatar:1', make_image(PNG))
+
+        assert (await AvatarDiskCache(tmp_path).get('avatar:1')).content == PNG
+
+    async def test_evicts_least_recently_used_over_size_cap(self, tmp_path):
+        """Test that the oldest unread entry is evicted when over the cap."""
+        image = make_image(PNG)
+        cache = AvatarDiskCache(tmp_path)
+        await cache.put('a', image)
+        cache.max_bytes = 2 * cache._total
+
+        for key in ('b', 'c'):
+            await cache.get('a')
+            await cache.put(key, image)
+
+        assert await cache.get('a') is not None
+        assert await cache.get('b') is None
+        assert await cache.get('c') is not None
+        assert len(list(tmp_path.glob('*.img'))) == 2
+
+
+class TestFetchAvatar:
+    """Tests for async avatar downloads."""
+
+    async def test_second_fetch_is_served_from_disk(self, tmp_path):
+        """Test that the upstream URL is requested only once."""
+        calls = []
+
+        def handler(request):
+            calls.append(request.url)
+            return httpx.Response(200, content=PNG, headers={'content-type': 'image/png'})
+
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(avatar_mod, 'avatar_cache', AvatarDiskCache(tmp_path)), \
+                patch.object(avatar_mod, 'http_client', return_value=http):
+            first = await avatar_mod.fetch_avatar('https://example.com/a.png', key='avatar:1')
+            second = await avatar_mod.fetch_avatar('https://example.com/a.png', key='avatar:1')
+
+        assert first.content == PNG
+        assert second.etag == first.etag
+        assert len(calls) == 1
+
+
+class TestAvatarEndpoint:
+    """Tests for ETag handling on /avatars/{player_id}."""
+
+    @patch('server.players._make_client')
+    def test_avatar_has_etag_and_honors_if_none_match(self, mock_make_client):
+        """Test that a matching If-None-Match returns 304 without a body."""
+        mock_client = Mock(spec=['get_avatar'])
+        mock_client.get_avatar = AsyncMock(return_value=PNG)
+        mock_make_client.return_value = mock_client
+
+        response = client.get('/avatars/12345?server=en')
+        assert response.status_code == 200
+        assert response.content == PNG
+        etag = response.headers['etag']
+
+        response = client.get('/avatars/12345?server=en', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.content == b''
+
+    @patch('server.players._make_client')
+    def test_repeat_requests_skip_the_upstream_lookup(self, mock_make_client):
+        """Test that a player's served avatar is answered from disk the next time."""
+        mock_client = Mock(spec=['get_raw_player_info', 'assets'])
+        mock_client.get_raw_player_info = AsyncMock(return_value={'players': [{'avatarId': 'avatar_1'}]})
+        mock_client.assets = Mock(spec=['get_file'])
+        mock_client.assets.get_file = Mock(return_value=PNG)
+        mock_make_client.return_value = mock_client
+
+        etag = client.get('/avatars/12345?server=en').headers['etag']
+        response = client.get('/avatars/12345?server=en', headers={'If-None-Match': etag})
+        assert client.get('/avatars/12345?server=en').content == PNG
+
+        assert response.status_code == 304
+        assert mock_client.get_raw_player_info.await_count == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
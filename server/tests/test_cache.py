@@ -0,0 +1,121 @@
+"""Tests for the in-process caches in server/cache.py."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import pytest
+from server.cache import CoalescingCache, TTLCache, credential_key
+
+
+class TestTTLCache:
+    """Tests for TTLCache expiry and eviction."""
+
+    def test_get_returns_stored_value(self):
+        """Test basic set/get round trip."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert 'a' in cache
+        assert cache.get('missing', 'default') == 'default'
+
+    def test_entries_expire_after_ttl(self, clock):
+        """Test that entries are dropped once their TTL has passed."""
+        cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=30)
+
+        clock.now = 10
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently read entry is evicted first."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert len(cache) == 2
+
+    def test_pop_removes_entry(self):
+        """Test that pop removes and returns an entry."""
+        cache = TTLCache()
+        cache.set('a', 1)
+
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+
+
+class TestCoalescingCache:
+    """Tests for single-flight loading and counters."""
+
+    async def test_concurrent_misses_share_one_load(self):
+        """Test that concurrent callers await a single in-flight load."""
+        cache = CoalescingCache(ttl=10)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {'value': calls}
+
+        results = await asyncio.gather(*(cache.get_or_load('k', loader) for _ in range(5)))
+
+        assert calls == 1
+        assert all(r is results[0] for r in results)
+        assert cache.stats()['misses'] == 1
+        assert cache.stats()['coalesced'] == 4
+
+        await cache.get_or_load('k', loader)
+        assert cache.stats()['hits'] == 1
+
+    async def test_failed_load_is_not_cached(self):
+        """Test that errors propagate and the next call retries."""
+        cache = CoalescingCache(ttl=10)
+
+        async def failing():
+            raise RuntimeError('upstream down')
+
+        async def ok():
+            return 'ok'
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load('k', failing)
+        assert await cache.get_or_load('k', ok) == 'ok'
+
+    async def test_zero_ttl_disables_caching(self):
+        """Test that ttl=0 reloads on every sequential call."""
+        cache = CoalescingCache(ttl=0)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        await cache.get_or_load('k', loader)
+        await cache.get_or_load('k', loader)
+        assert calls == 2
+
+
+class TestCredentialKey:
+    """Tests for credential hashing."""
+
+    def test_key_is_stable_and_hides_token(self):
+        """Test that keys are deterministic and don't contain the raw token."""
+        key = credential_key('uid', 'secret-token', 'en')
+
+        assert key == credential_key('uid', 'secret-token', 'en')
+        assert key != credential_key('uid', 'secret-token', 'jp')
+        assert 'secret-token' not in key
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,184 @@
+"""Tests for the upstream circuit breakers."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi.testclient import TestClient
+
+from server import ark_client
+from server.cache import TTLCache
+from server.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers, CircuitOpen, is_upstream_failure
+from server.main import app
+
+client = TestClient(app)
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f'status {status}')
+        self.status = status
+
+
+class TestCircuitBreaker:
+    """Tests for the closed -> open -> half-open cycle."""
+
+    def test_opens_after_consecutive_failures(self, clock):
+        """Test that the threshold counts consecutive failures only."""
+        breaker = CircuitBreaker(threshold=3, reset_timeout=10, clock=clock)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_half_open_allows_a_single_probe(self, clock):
+        """Test that after the reset timeout exactly one caller probes upstream."""
+        breaker = CircuitBreaker(threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self, clock):
+        """Test that a failed probe opens the circuit for another reset period."""
+        breaker = CircuitBreaker(threshold=5, reset_timeout=10, clock=clock)
+        for _ in range(5):
+            breaker.record_failure()
+
+        clock.now = 10
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == 10
+
+    @pytest.mark.parametrize('error, expected', [
+        (asyncio.TimeoutError(), True),
+        (ConnectionResetError(), True),
+        (StatusError(502), True),
+        (RuntimeError('{"Code": 100302, "Msg": "..."}'), True),
+        (StatusError(404), False),
+        (ValueError('player not found'), False),
+    ])
+    def test_failure_classification(self, error, expected):
+        """Test which errors count against the breaker."""
+        assert is_upstream_failure(error) is expected
+
+
+class TestCallUpstream:
+    """Tests for the breaker in ark_client.call_upstream."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_breakers(self, clock):
+        self.clock = clock
+        self.breakers = CircuitBreakers(threshold=2, reset_timeout=30, clock=self.clock)
+        with patch.object(ark_client, 'breakers', self.breakers):
+            yield
+
+    def test_open_circuit_fails_fast(self):
+        """Test that upstream is not called while the circuit is open."""
+        fn = AsyncMock(side_effect=asyncio.TimeoutError())
+
+        async def run():
+            for _ in range(2):
+                with pytest.raises(asyncio.TimeoutError):
+                    await ark_client.call_upstream('en', 'player', fn)
+            with pytest.raises(CircuitOpen) as e:
+                await ark_client.call_upstream('en', 'player', fn)
+            return e.value
+
+        error = asyncio.run(run())
+        assert fn.await_count == 2
+        assert error.retry_after == 30
+        assert self.breakers.get('en', 'data').state == CLOSED
+
+    def test_request_errors_do_not_trip_the_circuit(self):
+        """Test that upstream answering with a client-side error keeps the circuit closed."""
+        fn = AsyncMock(side_effect=ValueError('unknown player'))
+
+        async def run():
+            for _ in range(5):
+                with pytest.raises(ValueError):
+                    await ark_client.call_upstream('en', 'player', fn)
+
+        asyncio.run(run())
+        assert self.breakers.get('en', 'player').state == CLOSED
+
+    def test_successful_probe_closes(self):
+        """Test that after the reset timeout a good call closes the circuit."""
+        fn = AsyncMock(side_effect=[ConnectionError(), ConnectionError(), {'ok': True}])
+
+        async def run():
+            for _ in range(2):
+                with pytest.raises(ConnectionError):
+                    await ark_client.call_upstream('en', 'player', fn)
+            self.clock.now = 30
+            return await ark_client.call_upstream('en', 'player', fn)
+
+        assert asyncio.run(run()) == {'ok': True}
+        assert self.breakers.get('en', 'player').state == CLOSED
+
+
+class TestStaleFallback:
+    """Tests for serving stale user data while the circuit is open."""
+
+    def test_stale_snapshot_is_served(self):
+        """Test that get_user_data falls back to the last good snapshot."""
+        key = ark_client.credential_key('uid', 'token', 'en')
+        stale = TTLCache(maxsize=8, ttl=60)
+        stale.set(key, {'user': {'status': {'nickName': 'Doctor'}}})
+
+        with patch.object(ark_client, '_stale_user_data', stale), \
+                patch.object(ark_client, '_user_data', ark_client.CoalescingCache(maxsize=8, ttl=0)), \
+                patch.object(ark_client, '_load_user_data', AsyncMock(side_effect=CircuitOpen('en', 'data', 5))):
+            data = asyncio.run(ark_client.get_user_data('uid', 'token', 'en'))
+
+        assert data['user']['status']['nickName'] == 'Doctor'
+
+    def test_no_snapshot_raises(self):
+        """Test that without a snapshot the CircuitOpen error propagates."""
+        with patch.object(ark_client, '_stale_user_data', TTLCache(maxsize=8, ttl=60)), \
+                patch.object(ark_client, '_user_data', ark_client.CoalescingCache(maxsize=8, ttl=0)), \
+                patch.object(ark_client, '_load_user_data', AsyncMock(side_effect=CircuitOpen('en', 'data', 5))):
+            with pytest.raises(CircuitOpen):
+                asyncio.run(ark_client.get_user_data('uid', 'token', 'en'))
+
+
+class TestRouterCircuit:
+    """Tests for how open circuits surface over HTTP."""
+
+    @patch('server.ark_client._make_client')
+    def test_raw_players_gets_503(self, mock_make_client):
+        """Test that /players/raw answers 503 with Retry-After while the circuit is open."""
+        mock_client = Mock()
+        mock_client.get_raw_player_info = AsyncMock(return_value={'players': []})
+        mock_make_client.return_value = mock_client
+        breakers = CircuitBreakers(threshold=1, reset_timeout=30)
+        breakers.get('en', 'player').record_failure()
+
+        with patch.object(ark_client, 'breakers', breakers):
+            response = client.post('/players/raw', json={'ids': ['1']})
+
+        assert response.status_code == 503
+        assert int(response.headers['retry-after']) >= 29
+        mock_client.get_raw_player_info.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,167 @@
+"""Tests for Content-Encoding negotiation and precompressed bodies."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import gzip
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+
+from server import compression
+from server.compression import CompressionMiddleware, EncodedBody, negotiate
+from server.main import app
+
+client = TestClient(app)
+
+ROSTER = {'channel_uid': 'uid', 'yostar_token': 'token', 'server': 'en'}
+
+
+def raw_get(test_client, url, accept_encoding, **kwargs):
+    """Request without httpx's transparent decompression, to inspect the bytes sent."""
+    with test_client.stream('GET', url, headers={'Accept-Encoding': accept_encoding}, **kwargs) as response:
+        return response, b''.join(response.iter_raw())
+
+
+class TestNegotiate:
+    """Tests for Accept-Encoding parsing."""
+
+    @pytest.mark.parametrize('header, expected', [
+        ('', None),
+        ('identity', None),
+        ('gzip', 'gzip'),
+        ('gzip;q=0', None),
+        ('deflate, gzip;q=0.5', 'gzip'),
+        ('*', 'gzip'),
+    ])
+    def test_gzip_only(self, header, expected):
+        """Test negotiation when brotli is not available."""
+        with patch.object(compression, 'brotli', None):
+            assert negotiate(header) == expected
+
+    def test_brotli_preferred_when_available(self):
+        """Test that br wins over gzip at equal quality."""
+        with patch.object(compression, 'brotli', Mock()):
+            assert negotiate('gzip, br') == 'br'
+            assert negotiate('gzip, br;q=0.5') == 'gzip'
+
+
+class TestEncodedBody:
+    """Tests for memoized compressed variants."""
+
+    def test_variant_is_compressed_once(self):
+        """Test that repeated negotiation reuses the compressed bytes."""
+        body = EncodedBody(json.dumps({'x': 'y' * 5000}).encode(), etag='"abc"')
+
+        first, encoding = body.choose('gzip')
+        second, _ = body.choose('gzip')
+
+        assert encoding == 'gzip'
+        assert first is second
+        assert gzip.decompress(first) == body.content
+        assert body.variant_etag('gzip') == '"abc-gzip"'
+
+    def test_small_bodies_are_not_compressed(self):
+        """Test that bodies under the minimum size go out as identity."""
+        body = EncodedBody(b'{"ok":true}')
+
+        assert body.choose('gzip') == (body.content, None)
+
+
+class TestCachedRoutes:
+    """Tests for precompressed cached responses."""
+
+    def test_fixture_roster_is_gzipped(self):
+        """Test that /my/roster sends gzip bytes with Vary and a variant ETag."""
+        with client.stream('POST', '/my/roster', json=ROSTER, headers={'Accept-Encoding': 'gzip'}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert response.headers['etag'].endswith('-gzip"')
+        assert json.loads(gzip.decompress(raw))['ok'] is True
+
+    def test_identity_when_not_accepted(self):
+        """Test that clients without Accept-Encoding get plain JSON."""
+        response, raw = raw_get(client, '/fixtures/operators', 'identity')
+
+        assert 'content-encoding' not in response.headers
+        assert json.loads(raw)['ok'] is True
+
+    def test_conditional_get_matches_any_representation(self):
+        """Test that a 304 is returned for the identity ETag on a gzip request."""
+        gz, _ = raw_get(client, '/fixtures/operators', 'gzip')
+        plain, _ = raw_get(client, '/fixtures/operators', 'identity')
+
+        revalidated = client.get('/fixtures/operators', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['etag'],
+        })
+
+        assert gz.headers['etag'] != plain.headers['etag']
+        assert revalidated.status_code == 304
+
+
+class TestCompressionMiddleware:
+    """Tests for on-the-fly compression of selected routes."""
+
+    def make_app(self):
+        test_app = FastAPI()
+
+        @test_app.get('/graphql')
+        async def big():
+            return JSONResponse({'data': 'x' * 5000})
+
+        @test_app.get('/graphql/small')
+        async def small():
+            return PlainTextResponse('ok')
+
+        @test_app.get('/other')
+        async def other():
+            return JSONResponse({'data': 'x' * 5000})
+
+        test_app.add_middleware(CompressionMiddleware, paths=('/graphql',), minimum_size=1024)
+        return TestClient(test_app)
+
+    def test_large_response_on_listed_path_is_compressed(self):
+        """Test that a large response under a listed prefix is gzipped."""
+        response, raw = raw_get(self.make_app(), '/graphql', 'gzip')
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert int(response.headers['content-length']) == len(raw)
+        assert json.loads(gzip.decompress(raw)) == {'data': 'x' * 5000}
+
+    def test_small_and_unlisted_responses_pass_through(self):
+        """Test that small bodies and other paths are not compressed."""
+        test_client = self.make_app()
+
+        small, _ = raw_get(test_client, '/graphql/small', 'gzip')
+        other, _ = raw_get(test_client, '/other', 'gzip')
+
+        assert 'content-encoding' not in small.headers
+        assert 'content-encoding' not in other.headers
+
+    @patch('server.ark_client._make_client')
+    def test_graphql_raw_players_is_compressed(self, mock_make_client):
+        """Test that a large getRawPlayersData response is compressed by the app."""
+        mock_client = Mock()
+        mock_client.get_raw_player_info = AsyncMock(return_value={
+            'players': [{'uid': str(i), 'blob': 'x' * 200} for i in range(20)],
+        })
+        mock_make_client.return_value = mock_client
+        ids = ', '.join(f'"{i}"' for i in range(20))
+
+        with client.stream('POST', '/graphql', json={'query': '{ getRawPlayersData(ids: [%s]) }' % ids},
+                           headers={'Accept-Encoding': 'gzip'}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == 'gzip'
+        players = json.loads(json.loads(gzip.decompress(raw))['data']['getRawPlayersData'])['players']
+        assert len(players) == 20
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,72 @@
+"""Tests for the process-wide fixture store."""
+import sys
+import json
+import os
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from server.fixture_store import FixtureStore, fixture_store
+
+
+def write_fixture(path, nick):
+    """Write a minimal fixture file with a single operator."""
+    path.write_text(json.dumps({
+        'ok': True,
+        'data': {
+            'user': {
+                'troop': {'chars': {'1': {'charId': 'char_002_amiya', 'level': 50}}},
+                'status': {'nickName': nick},
+            }
+        }
+    }))
+
+
+class TestFixtureStore:
+    """Tests for FixtureStore caching and reload behaviour."""
+
+    def test_store_exposes_chars_and_status(self):
+        """Test that the shared store exposes the real fixture sections."""
+        chars = fixture_store.chars()
+        status = fixture_store.status()
+
+        assert len(chars) > 0
+        assert chars['1']['charId'] == 'char_002_amiya'
+        assert 'nickName' in status
+        assert fixture_store.user()['status'] is not None
+
+    def test_views_are_read_only(self):
+        """Test that returned views cannot be mutated."""
+        with pytest.raises(TypeError):
+            fixture_store.chars()['new'] = {}
+        with pytest.raises(TypeError):
+            fixture_store.status()['nickName'] = 'x'
+
+    def test_parses_once_while_unchanged(self, tmp_path):
+        """Test that repeated reads reuse the same parsed data."""
+        path = tmp_path / 'fixture.json'
+        write_fixture(path, 'First')
+        store = FixtureStore(path)
+
+        first = store.chars()
+        assert store.chars() is first
+        assert store.version == 1
+
+    def test_reloads_when_mtime_changes(self, tmp_path):
+        """Test that the store re-parses after the file is modified."""
+        path = tmp_path / 'fixture.json'
+        write_fixture(path, 'First')
+        store = FixtureStore(path)
+        assert store.status()['nickName'] == 'First'
+
+        write_fixture(path, 'Second')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert store.status()['nickName'] == 'Second'
+        assert store.version == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -154,6 +154,38 @@ class TestGraphQLOperators:
         
         assert data["data"]["operator"] is None
     
+    def test_query_operator_nested_fields(self):
+        """Test that lazily resolved skills and equip are returned when selected."""
+        query = """
+        {
+          operator(charId: "char_109_fmout") {
+            skills { unlock specializeLevel }
+            equip { id level { level hide } }
+          }
+        }
+        """
+        response = client.post("/graphql", json={"query": query})
+        operator = response.json()["data"]["operator"]
+
+        assert len(operator["skills"]) == 2
+        assert {e["id"] for e in operator["equip"]} == {"uniequip_001_fmout", "uniequip_002_fmout"}
+        assert operator["equip"][0]["level"] == {"level": 1, "hide": 1}
+
+    def test_query_operators_by_ids(self):
+        """Test batch lookup keeps request order and skips unknown IDs."""
+        query = """
+        {
+          operatorsByIds(ids: ["char_503_rang", "char_999_notexist", "char_002_amiya"]) {
+            charId
+          }
+        }
+        """
+        response = client.post("/graphql", json={"query": query})
+        data = response.json()
+
+        ids = [op["charId"] for op in data["data"]["operatorsByIds"]]
+        assert ids == ["char_503_rang", "char_002_amiya"]
+
     def test_query_operators_custom_fields(self):
         """Test querying operators with custom field selection."""
         query = """
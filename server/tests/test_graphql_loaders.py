@@ -0,0 +1,124 @@
+"""Tests for the GraphQL player DataLoaders."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi.testclient import TestClient
+
+from server.graphql_loaders import merge_raw_players, split_players, split_raw_players
+from server.main import app
+
+client = TestClient(app)
+
+
+def fake_expand(ids, server='en'):
+    return [{'playerId': pid, 'nickName': f'Doctor{pid}', 'level': 100} for pid in ids]
+
+
+class TestPlayerLoaderBatching:
+    """Tests that one query makes one upstream call per server."""
+
+    @patch('server.ark_client.expand_player_ids')
+    def test_aliased_get_player_is_batched(self, mock_expand):
+        """Test that aliased getPlayer fields share one deduplicated call."""
+        mock_expand.side_effect = fake_expand
+        query = """
+        {
+          a: getPlayer(playerId: "1") { playerId nickName }
+          b: getPlayer(playerId: "2") { playerId nickName }
+          c: getPlayer(playerId: "1") { playerId }
+          d: expandPlayers(ids: ["2", "3"]) { players { playerId } }
+        }
+        """
+
+        data = client.post('/graphql', json={'query': query}).json()['data']
+
+        assert mock_expand.call_count == 1
+        assert sorted(mock_expand.call_args.args[0]) == ['1', '2', '3']
+        assert data['a']['nickName'] == 'Doctor1'
+        assert data['b']['playerId'] == '2'
+        assert data['c']['playerId'] == '1'
+        assert [p['playerId'] for p in data['d']['players']] == ['2', '3']
+
+    @patch('server.ark_client.expand_player_ids')
+    def test_one_call_per_server(self, mock_expand):
+        """Test that different servers are loaded separately."""
+        mock_expand.side_effect = fake_expand
+        query = """
+        {
+          a: getPlayer(playerId: "1", server: "en") { playerId }
+          b: getPlayer(playerId: "2", server: "jp") { playerId }
+        }
+        """
+
+        client.post('/graphql', json={'query': query})
+
+        servers = sorted(call.kwargs['server'] for call in mock_expand.call_args_list)
+        assert servers == ['en', 'jp']
+
+    @patch('server.ark_client._make_client')
+    def test_raw_fields_are_batched(self, mock_make_client):
+        """Test that raw player fields share one get_raw_player_info call."""
+        mock_client = Mock()
+        mock_client.get_raw_player_info = AsyncMock(return_value={
+            'players': [{'uid': '1', 'n': 'a'}, {'uid': '2', 'n': 'b'}],
+        })
+        mock_make_client.return_value = mock_client
+        query = """
+        {
+          one: getRawPlayerData(playerId: "1")
+          many: getRawPlayersData(ids: ["2", "1"])
+        }
+        """
+
+        data = client.post('/graphql', json={'query': query}).json()['data']
+
+        assert mock_client.get_raw_player_info.await_count == 1
+        assert json.loads(data['one']) == {'players': [{'uid': '1', 'n': 'a'}]}
+        assert [p['uid'] for p in json.loads(data['many'])['players']] == ['2', '1']
+
+
+class TestSplitHelpers:
+    """Tests for mapping batched results back to ids."""
+
+    def test_split_players_matches_ids(self):
+        """Test that summaries are matched by id and missing ids are None."""
+        players = [{'id': '2'}, {'id': '1'}]
+
+        assert split_players(players, ['1', '2', '3']) == ([{'id': '1'}, {'id': '2'}, None], [])
+
+    def test_split_players_keeps_leftovers_apart(self):
+        """Test that summaries under another id are never paired with a requested id."""
+        assert split_players([{'id': 'other'}], ['1']) == ([None], [{'id': 'other'}])
+
+    @patch('server.ark_client.expand_player_ids')
+    def test_expand_players_keeps_extra_summaries(self, mock_expand):
+        """Test that expandPlayers returns summaries upstream gave under another id."""
+        mock_expand.return_value = [{'playerId': '1'}, {'playerId': '99'}]
+        query = """
+        {
+          a: getPlayer(playerId: "2") { playerId }
+          b: expandPlayers(ids: ["1", "2"]) { players { playerId } }
+        }
+        """
+
+        data = client.post('/graphql', json={'query': query}).json()['data']
+
+        assert data['a'] is None
+        assert [p['playerId'] for p in data['b']['players']] == ['1', '99']
+
+    def test_unattributable_raw_payload_is_shared(self):
+        """Test that a response without uids is returned for every id."""
+        raw = {'players': ['data1', 'data2']}
+        payloads = split_raw_players(raw, ['1', '2'])
+
+        assert payloads == [raw, raw]
+        assert merge_raw_players(payloads) is raw
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,80 @@
+"""Tests for selective JSON section loading."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import json
+import pytest
+from unittest.mock import patch
+
+from server import json_sections
+from server.fixture_store import FIXTURE_PATH, SECTIONS
+from server.json_sections import extract, load_sections
+
+DOC = {
+    'data': {
+        'user': {
+            'troop': {'chars': {'1': {'charId': 'char_a', 'skills': [{'unlock': 1}]}}, 'squads': [1, 2]},
+            'status': {'nickName': 'Doctor', 'level': 120, 'ratio': 0.5, 'flag': None},
+            'dungeon': {'stages': {'main_00-01': {'state': 3}}},
+        },
+        'list': [{'a': 1}, {'b': [2, 3]}],
+        'n': 7,
+    },
+}
+PATHS = [('data', 'user', 'troop', 'chars'), ('data', 'user', 'status'), ('data', 'list'), ('data', 'n'), ('missing',)]
+EXPECTED = {
+    'data': {
+        'user': {'troop': {'chars': DOC['data']['user']['troop']['chars']}, 'status': DOC['data']['user']['status']},
+        'list': DOC['data']['list'],
+        'n': 7,
+    },
+}
+
+
+@pytest.fixture
+def doc_path(tmp_path):
+    path = tmp_path / 'doc.json'
+    path.write_text(json.dumps(DOC))
+    return path
+
+
+class TestExtract:
+    """Tests for copying selected paths out of a parsed document."""
+
+    def test_extract_keeps_only_paths(self):
+        """Test that only the selected subtrees are returned."""
+        assert extract(DOC, PATHS) == EXPECTED
+
+
+class TestLoadSections:
+    """Tests for load_sections with each available parser."""
+
+    def test_streaming_parser(self, doc_path):
+        """Test the ijson path builds only the selected subtrees."""
+        if json_sections.ijson is None:
+            pytest.skip('ijson with a C backend is not installed')
+
+        assert load_sections(doc_path, PATHS) == EXPECTED
+
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_full_parse_fallback(self, doc_path, use_orjson):
+        """Test the orjson/json fallback gives the same result."""
+        if use_orjson and json_sections.orjson is None:
+            pytest.skip('orjson is not installed')
+        orjson = json_sections.orjson if use_orjson else None
+
+        with patch.object(json_sections, 'ijson', None), patch.object(json_sections, 'orjson', orjson):
+            assert load_sections(doc_path, PATHS) == EXPECTED
+
+    def test_fixture_sections_match_full_parse(self):
+        """Test that the real fixture's sections equal a full json.load."""
+        with open(FIXTURE_PATH) as f:
+            full = json.load(f)
+
+        assert load_sections(FIXTURE_PATH, SECTIONS) == extract(full, SECTIONS)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,102 @@
+"""Tests for GraphQL automatic persisted queries and document caching."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import hashlib
+import json
+import pytest
+from fastapi.testclient import TestClient
+from strawberry.extensions import ParserCache
+
+from server.graphql_schema import schema
+from server.main import app, graphql_app
+from server.persisted_queries import PersistedQueryStore
+
+client = TestClient(app)
+
+QUERY = '{ operator(charId: "char_002_amiya") { charId } }'
+HASH = hashlib.sha256(QUERY.encode()).hexdigest()
+
+
+def apq(digest=HASH, version=1):
+    return {'persistedQuery': {'version': version, 'sha256Hash': digest}}
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(graphql_app, 'persisted_queries', PersistedQueryStore(maxsize=8))
+
+
+class TestPersistedQueries:
+    """Tests for the APQ protocol on /graphql."""
+
+    def test_unknown_hash_asks_for_query(self):
+        """Test that a hash-only request for an unknown hash returns PersistedQueryNotFound."""
+        response = client.post('/graphql', json={'extensions': apq()})
+
+        assert response.status_code == 200
+        error = response.json()['errors'][0]
+        assert error['message'] == 'PersistedQueryNotFound'
+        assert error['extensions']['code'] == 'PERSISTED_QUERY_NOT_FOUND'
+
+    def test_registered_hash_runs_via_post_and_get(self):
+        """Test that after one full request the hash alone is enough."""
+        first = client.post('/graphql', json={'query': QUERY, 'extensions': apq()})
+        by_post = client.post('/graphql', json={'extensions': apq()})
+        by_get = client.get('/graphql', params={'extensions': json.dumps(apq())})
+
+        expected = {'data': {'operator': {'charId': 'char_002_amiya'}}}
+        assert first.json() == expected
+        assert by_post.json() == expected
+        assert by_get.status_code == 200
+        assert by_get.json() == expected
+
+    def test_hash_mismatch_is_rejected(self):
+        """Test that a query is not stored under a hash it doesn't match."""
+        response = client.post('/graphql', json={'query': QUERY, 'extensions': apq('0' * 64)})
+
+        assert response.status_code == 400
+        assert len(graphql_app.persisted_queries) == 0
+
+    def test_unsupported_version(self):
+        """Test that unknown APQ versions are reported as unsupported."""
+        response = client.post('/graphql', json={'query': QUERY, 'extensions': apq(version=2)})
+
+        assert response.json()['errors'][0]['extensions']['code'] == 'PERSISTED_QUERY_NOT_SUPPORTED'
+
+    def test_store_evicts_least_recently_used(self):
+        """Test the hash store is bounded."""
+        store = PersistedQueryStore(maxsize=2)
+        queries = ['{ a }', '{ b }', '{ c }']
+        digests = [hashlib.sha256(q.encode()).hexdigest() for q in queries]
+
+        store.register(digests[0], queries[0])
+        store.register(digests[1], queries[1])
+        store.get(digests[0])
+        store.register(digests[2], queries[2])
+
+        assert store.get(digests[0]) == queries[0]
+        assert store.get(digests[1]) is None
+
+
+class TestDocumentCache:
+    """Tests for parse/validate caching on the schema."""
+
+    def test_repeated_query_is_parsed_once(self):
+        """Test that a repeated query text hits the parser cache."""
+        parser = next(e for e in schema.extensions if isinstance(e, ParserCache))
+        query = '{ userStatus { nickName } }'
+
+        client.post('/graphql', json={'query': query})
+        before = parser.cached_parse_document.cache_info()
+        client.post('/graphql', json={'query': query})
+        after = parser.cached_parse_document.cache_info()
+
+        assert after.hits == before.hits + 1
+        assert after.misses == before.misses
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
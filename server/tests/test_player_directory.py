@@ -0,0 +1,170 @@
+"""Tests for the SQLite player directory."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import pytest
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi.testclient import TestClient
+
+from server import ark_client
+from server.main import app
+from server.player_directory import PlayerDirectory
+from server.search_cache import SearchCache
+
+client = TestClient(app)
+
+PLAYERS = [
+    {'id': '1', 'name': 'Amiya', 'level': 120},
+    {'id': '2', 'name': 'Amiyi', 'level': 90},
+    {'id': '3', 'name': 'Amber', 'level': 10},
+]
+
+
+class TestPlayerDirectory:
+    """Tests for id and nickname lookups."""
+
+    def test_get_many_returns_fresh_known_ids(self, clock):
+        """Test that only known ids within max_age are returned."""
+        directory = PlayerDirectory(':memory:', max_age=60, clock=clock)
+        asyncio.run(directory.record('en', PLAYERS[:2]))
+
+        assert set(asyncio.run(directory.get_many('en', ['1', '2', '9']))) == {'1', '2'}
+        assert asyncio.run(directory.get_many('jp', ['1'])) == {}
+
+        clock.now += 61
+        assert asyncio.run(directory.get_many('en', ['1'])) == {}
+
+    def test_record_updates_existing_rows(self):
+        """Test that a player seen again gets the new name and level."""
+        directory = PlayerDirectory(':memory:')
+        asyncio.run(directory.record('en', [PLAYERS[0]]))
+        asyncio.run(directory.record('en', [{'id': '1', 'name': 'Amiya', 'level': 121}]))
+
+        assert asyncio.run(directory.get_many('en', ['1']))['1']['level'] == 121
+
+    def test_search_needs_a_complete_covering_search(self):
+        """Test that nickname searches are only answered under a complete prefix search."""
+        directory = PlayerDirectory(':memory:')
+        asyncio.run(directory.record('en', PLAYERS))
+
+        assert asyncio.run(directory.search('en', 'Amiy', 10)) is None
+
+        asyncio.run(directory.record('en', PLAYERS, query='am', limit=10))
+        assert [p['id'] for p in asyncio.run(directory.search('en', 'AMIY', 10))] == ['1', '2']
+        assert asyncio.run(directory.search('en', 'b', 10)) is None
+
+        asyncio.run(directory.record('en', PLAYERS[:2], query='ami', limit=2))
+        assert asyncio.run(directory.search('en', 'amiyx', 10)) == []
+
+    def test_truncated_search_is_not_recorded_as_complete(self):
+        """Test that a search that hit its limit doesn't cover anything."""
+        directory = PlayerDirectory(':memory:')
+        asyncio.run(directory.record('en', PLAYERS, query='am', limit=3))
+
+        assert asyncio.run(directory.search('en', 'amiy', 10)) is None
+
+    def test_survives_restart(self, tmp_path):
+        """Test that a new instance on the same file sees recorded players."""
+        path = str(tmp_path / 'players.sqlite3')
+        first = PlayerDirectory(path)
+        asyncio.run(first.record('en', PLAYERS))
+        first.close()
+
+        assert set(asyncio.run(PlayerDirectory(path).get_many('en', ['1', '3']))) == {'1', '3'}
+
+    def test_sqlite_runs_off_the_event_loop_thread(self):
+        """Test that lookups and writes happen in a worker thread."""
+        directory = PlayerDirectory(':memory:')
+        threads = []
+        original = directory._connect
+
+        def connect():
+            threads.append(threading.get_ident())
+            return original()
+
+        async def run():
+            with patch.object(directory, '_connect', connect):
+                await directory.record('en', PLAYERS)
+                await directory.get_many('en', ['1'])
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        assert threads and loop_thread not in threads
+
+    def test_unopenable_database_is_ignored(self, tmp_path):
+        """Test that a bad path disables the directory instead of failing lookups."""
+        directory = PlayerDirectory(str(tmp_path / 'missing' / 'players.sqlite3'))
+
+        asyncio.run(directory.record('en', PLAYERS))
+        assert asyncio.run(directory.get_many('en', ['1'])) == {}
+        assert asyncio.run(directory.search('en', 'am', 10)) is None
+
+
+class TestDirectoryLookups:
+    """Tests for expand/search answered from the directory."""
+
+    @patch('server.ark_client._make_client')
+    def test_expand_only_fetches_unknown_ids(self, mock_make_client, empty_player_directory):
+        """Test that known ids skip upstream and fetched ids are recorded."""
+        mock_client = Mock()
+        mock_client.get_players = AsyncMock(return_value=[SimpleNamespace(uid='3', nickname='Amber', level=10)])
+        mock_make_client.return_value = mock_client
+        asyncio.run(empty_player_directory.record('en', PLAYERS[:2]))
+
+        out = asyncio.run(ark_client.expand_player_ids(['1', '3', '2']))
+
+        assert [p['id'] for p in out] == ['1', '3', '2']
+        mock_client.get_players.assert_awaited_once_with(['3'], server='en')
+        assert '3' in asyncio.run(empty_player_directory.get_many('en', ['3']))
+
+    @patch('server.ark_client._make_client')
+    def test_expand_keeps_input_order(self, mock_make_client, empty_player_directory):
+        """Test that directory hits don't move ahead of upstream results."""
+        mock_client = Mock()
+        mock_client.get_players = AsyncMock(return_value=[
+            SimpleNamespace(uid='2', nickname='Amiyi', level=90),
+            SimpleNamespace(uid='1', nickname='Amiya', level=120),
+        ])
+        mock_make_client.return_value = mock_client
+        asyncio.run(empty_player_directory.record('en', PLAYERS[2:]))
+
+        out = asyncio.run(ark_client.expand_player_ids(['1', '2', '3']))
+
+        assert [p['id'] for p in out] == ['1', '2', '3']
+
+    @patch('server.ark_client._make_client')
+    def test_character_detail_from_directory(self, mock_make_client, empty_player_directory):
+        """Test that /characters/{id} answers a known player without upstream."""
+        mock_client = Mock()
+        mock_client.get_players = AsyncMock(return_value=[])
+        mock_make_client.return_value = mock_client
+        asyncio.run(empty_player_directory.record('en', PLAYERS))
+
+        response = client.get('/characters/2')
+
+        assert response.json()['player'] == {'id': '2', 'name': 'Amiyi', 'level': 90}
+        mock_client.get_players.assert_not_awaited()
+
+    @patch('server.ark_client._make_client')
+    def test_search_after_restart_uses_directory(self, mock_make_client):
+        """Test that a recorded complete search answers once the memory cache is gone."""
+        mock_client = Mock()
+        mock_client.search_players = AsyncMock(return_value=[SimpleNamespace(uid='1', nickname='Amiya', level=120)])
+        mock_make_client.return_value = mock_client
+
+        with patch.object(ark_client, 'search_cache', SearchCache()):
+            asyncio.run(ark_client.search_players('Ami', server='en'))
+        with patch.object(ark_client, 'search_cache', SearchCache()):
+            out = asyncio.run(ark_client.search_players('Amiya', server='en'))
+
+        assert out == [{'id': '1', 'name': 'Amiya', 'level': 120}]
+        assert mock_client.search_players.await_count == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+"""Tests for the upstream token-bucket governor."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi.testclient import TestClient
+
+from server import ark_client
+from server.main import app
+from server.rate_limit import RateGovernor, RateLimited, TokenBucket, parse_rate
+from server.search_cache import SearchCache
+
+client = TestClient(app)
+
+
+class TestTokenBucket:
+    """Tests for token accounting and queueing order."""
+
+    def test_parse_rate(self):
+        """Test 'rate:burst' parsing and its defaults."""
+        assert parse_rate('5:10') == (5.0, 10.0)
+        assert parse_rate('0.5') == (0.5, 1.0)
+
+    def test_burst_then_queue_in_arrival_order(self, clock):
+        """Test that callers past the burst get increasing, fixed waits."""
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+        waits = [bucket.reserve(max_wait=10) for _ in range(4)]
+
+        assert waits == [0.0, 0.0, 0.5, 1.0]
+
+    def test_refills_over_time_up_to_burst(self, clock):
+        """Test that idle time refills tokens but never beyond the burst."""
+        bucket = TokenBucket(rate=1, burst=2, clock=clock)
+        bucket.reserve(10)
+        bucket.reserve(10)
+
+        clock.now = 100
+        assert [bucket.reserve(0) for _ in range(3)] == [0.0, 0.0, None]
+
+    def test_over_max_wait_is_rejected_without_taking_a_token(self, clock):
+        """Test that a rejected caller doesn't push later callers back."""
+        bucket = TokenBucket(rate=1, burst=1, clock=clock)
+        bucket.reserve(10)
+
+        assert bucket.reserve(max_wait=0.5) is None
+        assert bucket.reserve(max_wait=1) == 1.0
+
+    def test_cancelled_waiter_returns_its_token(self):
+        """Test that giving up while queued releases the reservation."""
+        bucket = TokenBucket(rate=1, burst=1)
+
+        async def run():
+            await bucket.acquire(10)
+            waiter = asyncio.ensure_future(bucket.acquire(10))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+
+        asyncio.run(run())
+        assert bucket.reserve(max_wait=1.5) <= 1.0
+
+    def test_zero_rate_is_unthrottled(self):
+        """Test that a rate of 0 disables the bucket."""
+        bucket = TokenBucket(rate=0, burst=1)
+
+        assert all(bucket.reserve(0) == 0.0 for _ in range(100))
+
+
+class TestRateGovernor:
+    """Tests for per-region, per-operation buckets."""
+
+    def test_buckets_are_per_region_and_operation(self, clock):
+        """Test that exhausting one bucket leaves the others alone."""
+        governor = RateGovernor(limits={'player': (1, 1), 'data': (1, 1)}, max_wait=0, clock=clock)
+
+        async def run():
+            await governor.acquire('en', 'player')
+            with pytest.raises(RateLimited) as e:
+                await governor.acquire('en', 'player')
+            await governor.acquire('jp', 'player')
+            await governor.acquire('en', 'data')
+            return e.value
+
+        error = asyncio.run(run())
+        assert error.operation == 'player'
+        assert error.retry_after == 1.0
+        assert governor.stats()['rejected'] == 1
+
+    def test_unknown_operation(self):
+        """Test that typos in operation names fail loudly."""
+        with pytest.raises(ValueError):
+            RateGovernor(limits={}).bucket('en', 'players')
+
+
+class TestRouterThrottling:
+    """Tests for how throttled upstream calls surface over HTTP."""
+
+    @patch('server.ark_client._make_client')
+    def test_search_gets_429_with_retry_after(self, mock_make_client):
+        """Test that a search past the wait limit returns 429 without calling upstream."""
+        mock_client = Mock()
+        mock_client.search_players = AsyncMock(return_value=[])
+        mock_make_client.return_value = mock_client
+        governor = RateGovernor(limits={'player': (0.5, 1)}, max_wait=0)
+
+        with patch.object(ark_client, 'governor', governor), \
+                patch.object(ark_client, 'search_cache', SearchCache()):
+            first = client.post('/players/search', json={'nickname': 'Doctor'})
+            second = client.post('/players/search', json={'nickname': 'Kaltsit'})
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert second.headers['retry-after'] == '2'
+        assert mock_client.search_players.await_count == 1
+
+    @patch('server.auth.send_game_auth_code')
+    def test_app_handler_maps_rate_limited_to_429(self, mock_send):
+        """Test that a RateLimited error from any route becomes a 429, not a 500."""
+        mock_send.side_effect = RateLimited('en', 'auth_code', 12.5)
+
+        response = client.post('/auth/game-code', json={'email': 'doctor@example.com', 'server': 'en'})
+
+        assert response.status_code == 429
+        assert response.headers['retry-after'] == '13'
+        assert 'auth_code' in response.json()['detail']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
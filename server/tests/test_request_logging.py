@@ -0,0 +1,120 @@
+"""Tests for the request logging middleware."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from server.main import RequestLoggingMiddleware
+
+
+def make_app(**kwargs):
+    """Build a small app wrapped in the logging middleware."""
+    app = FastAPI()
+
+    @app.post('/echo')
+    async def echo(payload: dict):
+        return payload
+
+    @app.get('/stream')
+    async def stream():
+        async def chunks():
+            for i in range(100):
+                yield f'chunk-{i:03d};'.encode()
+        return StreamingResponse(chunks(), media_type='text/plain')
+
+    @app.get('/binary/blob')
+    async def blob():
+        return StreamingResponse(iter([b'\x89PNG' * 10]), media_type='image/png')
+
+    app.add_middleware(RequestLoggingMiddleware, **kwargs)
+    return app
+
+
+def log_lines(caplog):
+    return [r.getMessage() for r in caplog.records if r.name == 'ak-chars.server']
+
+
+class TestRequestLoggingMiddleware:
+    """Tests for RequestLoggingMiddleware."""
+
+    def test_streaming_body_passes_through_untouched(self, caplog):
+        """Test that streamed responses are delivered intact and logged truncated."""
+        client = TestClient(make_app(max_body_bytes=20, route_body_bytes={}))
+
+        with caplog.at_level(logging.INFO, logger='ak-chars.server'):
+            response = client.get('/stream')
+
+        assert response.status_code == 200
+        assert response.text == ''.join(f'chunk-{i:03d};' for i in range(100))
+        out = [line for line in log_lines(caplog) if line.startswith('<--')]
+        assert len(out) == 1
+        assert 'status=200' in out[0]
+        assert 'chunk-000;chunk-001;' in out[0]
+        assert 'chunk-002' not in out[0]
+
+    def test_request_body_is_sanitized(self, caplog):
+        """Test that sensitive request fields are redacted in the log."""
+        client = TestClient(make_app(route_body_bytes={}))
+
+        with caplog.at_level(logging.INFO, logger='ak-chars.server'):
+            response = client.post('/echo', json={'yostar_token': 'secret456', 'server': 'en'})
+
+        assert response.json() == {'yostar_token': 'secret456', 'server': 'en'}
+        lines = log_lines(caplog)
+        assert any(line.startswith('--> POST /echo') for line in lines)
+        assert not any('secret456' in line for line in lines)
+
+    def test_route_limit_disables_body_logging(self, caplog):
+        """Test that a zero per-route limit skips body capture."""
+        client = TestClient(make_app(route_body_bytes={'/binary': 0}))
+
+        with caplog.at_level(logging.INFO, logger='ak-chars.server'):
+            client.get('/binary/blob')
+
+        out = [line for line in log_lines(caplog) if line.startswith('<--')]
+        assert out[0].endswith('body=')
+
+    def test_sample_rate_zero_skips_logging(self, caplog):
+        """Test that unsampled requests are passed through without logging."""
+        client = TestClient(make_app(sample_rate=0.0))
+
+        with caplog.at_level(logging.INFO, logger='ak-chars.server'):
+            response = client.get('/stream')
+
+        assert response.status_code == 200
+        assert log_lines(caplog) == []
+
+    def test_compressed_body_is_not_logged(self, caplog):
+        """Test that a Content-Encoding'd response logs its encoding, not its bytes."""
+        app = FastAPI()
+
+        @app.get('/gz')
+        async def gz():
+            import gzip
+            return Response(gzip.compress(b'{"ok":true}'), media_type='application/json', headers={'Content-Encoding': 'gzip'})
+
+        app.add_middleware(RequestLoggingMiddleware, route_body_bytes={})
+
+        with caplog.at_level(logging.INFO, logger='ak-chars.server'):
+            TestClient(app).get('/gz')
+
+        out = [line for line in log_lines(caplog) if line.startswith('<--')]
+        assert out[0].endswith('body=<gzip>')
+
+    def test_longest_prefix_wins(self):
+        """Test per-route limits resolve by longest matching prefix."""
+        middleware = RequestLoggingMiddleware(None, max_body_bytes=100, route_body_bytes={'/a': 10, '/a/b': 0})
+
+        assert middleware.body_limit('/a/b/c') == 0
+        assert middleware.body_limit('/a/x') == 10
+        assert middleware.body_limit('/other') == 100
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
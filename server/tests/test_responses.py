@@ -0,0 +1,154 @@
+"""Tests for the fast JSON response helpers."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import json
+import pytest
+from types import MappingProxyType
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from server import responses
+from server.responses import EncodedBodies, dumps
+from server.main import app
+
+client = TestClient(app)
+
+
+class TestDumps:
+    """Tests for JSON encoding."""
+
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_encodes_read_only_views(self, use_orjson):
+        """Test that MappingProxyType and tuples encode like dicts and lists."""
+        if use_orjson and responses.orjson is None:
+            pytest.skip('orjson is not installed')
+        content = {'ok': True, 'chars': MappingProxyType({'1': {'name': 'アーミヤ'}}), 'ids': ('a',)}
+
+        with patch.object(responses, 'orjson', responses.orjson if use_orjson else None):
+            body = dumps(content)
+
+        assert json.loads(body) == {'ok': True, 'chars': {'1': {'name': 'アーミヤ'}}, 'ids': ['a']}
+
+    def test_unknown_types_raise(self):
+        """Test that unsupported objects are rejected."""
+        with pytest.raises(TypeError):
+            dumps({'x': object()})
+
+
+class TestEncodedBodies:
+    """Tests for the per-source encoded body memo."""
+
+    def test_reuses_body_for_same_source(self):
+        """Test that build() runs once while the source object is unchanged."""
+        cache = EncodedBodies(maxsize=8, ttl=60)
+        source = {'a': 1}
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {'ok': True, 'data': source}
+
+        first = cache.get(source, 'tag', build)
+        second = cache.get(source, 'tag', build)
+
+        assert first is second
+        assert len(calls) == 1
+
+    def test_new_source_is_reencoded(self):
+        """Test that an equal but different source object is encoded again."""
+        cache = EncodedBodies(maxsize=8, ttl=60)
+
+        cache.get({'a': 1}, 'tag', lambda: {'v': 1})
+        body = cache.get({'a': 1}, 'tag', lambda: {'v': 2})
+
+        assert json.loads(body.content) == {'v': 2}
+
+
+class TestRouterResponses:
+    """Tests for the routers' JSON responses."""
+
+    def test_my_roster_snapshot_is_served_pre_encoded(self):
+        """Test that repeat roster calls on one cached snapshot reuse its encoded body."""
+        snapshot = {'user': {'troop': {'chars': {'1': {'charId': 'char_002_amiya'}}}}}
+        payload = {'channel_uid': 'uid', 'yostar_token': 'token', 'server': 'en'}
+        with patch('server.auth.USE_FIXTURES', False), \
+                patch('server.auth.get_user_data', AsyncMock(return_value=snapshot)), \
+                patch.object(responses.encoded_bodies, '_cache', responses.TTLCache(maxsize=8, ttl=60)), \
+                patch.object(responses, 'dumps', wraps=responses.dumps) as spy:
+            first = client.post('/my/roster', json=payload)
+            second = client.post('/my/roster', json=payload)
+
+        assert first.headers['content-type'] == 'application/json'
+        assert first.content == second.content
+        assert first.json() == {'ok': True, 'chars': snapshot['user']['troop']['chars']}
+        assert spy.call_count == 1
+
+    def test_fixture_operators_json(self):
+        """Test that directly returned responses keep the same JSON shape."""
+        response = client.get('/fixtures/operators?ids=char_002_amiya')
+
+        assert response.status_code == 200
+        assert response.json()['operators'][0]['charId'] == 'char_002_amiya'
+
+
+class TestFixtureResponses:
+    """Tests for ETag'd, pre-encoded fixture responses."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_bodies(self):
+        with patch.object(responses.fixture_responses, '_cache', responses.TTLCache(maxsize=8, ttl=float('inf'))):
+            yield
+
+    @pytest.mark.parametrize('url', [
+        '/fixtures/operators?min_elite=2',
+        '/fixtures/operator/char_002_amiya',
+        '/fixtures/user-status',
+    ])
+    def test_etag_and_304(self, url):
+        """Test that fixture GETs carry an ETag and honor If-None-Match."""
+        first = client.get(url)
+        etag = first.headers['etag']
+
+        second = client.get(url, headers={'If-None-Match': etag})
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.content == b''
+        assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+    def test_equivalent_params_share_one_body(self):
+        """Test that id order and a zero level bound normalize to the same entry."""
+        with patch.object(responses, 'dumps', wraps=responses.dumps) as spy:
+            a = client.get('/fixtures/operators?ids=char_002_amiya,char_503_rang')
+            b = client.get('/fixtures/operators?ids=char_503_rang,char_002_amiya&min_level=0')
+
+        assert a.headers['etag'] == b.headers['etag']
+        assert spy.call_count == 1
+
+    def test_new_fixture_version_invalidates(self):
+        """Test that a version change drops cached bodies."""
+        bodies = responses.VersionedBodies(maxsize=8)
+
+        body = bodies.get(1, 'k', lambda: {'v': 1})
+        assert bodies.get(1, 'k', lambda: {'v': 2}) is body
+        body2 = bodies.get(2, 'k', lambda: {'v': 2})
+
+        assert json.loads(body2.content) == {'v': 2}
+        assert body2.etag != body.etag
+
+    def test_my_roster_fixture_has_etag(self):
+        """Test that the fixture roster is served with an ETag (no 304 for POST)."""
+        payload = {'channel_uid': 'uid', 'yostar_token': 'token', 'server': 'en'}
+        first = client.post('/my/roster', json=payload)
+
+        second = client.post('/my/roster', json=payload, headers={'If-None-Match': first.headers['etag']})
+
+        assert second.status_code == 200
+        assert second.headers['etag'] == first.headers['etag']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
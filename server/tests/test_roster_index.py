@@ -0,0 +1,171 @@
+"""Tests for the filterable roster index."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import json
+import pytest
+
+from server.fixture_store import FixtureStore, FIXTURE_PATH
+from server.roster_index import RosterIndex
+
+
+def ids_of(entries):
+    return [e['charId'] for e in entries]
+
+
+def linear_filter(chars, ids=None, min_level=None, max_level=None,
+                  min_elite=None, max_elite=None, min_potential=None):
+    """Reference implementation: the resolvers' original linear scan."""
+    out = []
+    for c in chars.values():
+        if ids and c.get('charId', '') not in ids:
+            continue
+        if min_level and c.get('level', 0) < min_level:
+            continue
+        if max_level and c.get('level', 0) > max_level:
+            continue
+        if min_elite is not None and c.get('evolvePhase', 0) < min_elite:
+            continue
+        if max_elite is not None and c.get('evolvePhase', 0) > max_elite:
+            continue
+        if min_potential is not None and c.get('potentialRank', 0) < min_potential:
+            continue
+        out.append(c)
+    return out
+
+
+@pytest.fixture(scope='module')
+def chars():
+    with open(FIXTURE_PATH) as f:
+        return json.load(f)['data']['user']['troop']['chars']
+
+
+class TestRosterIndexFilter:
+    """Tests for RosterIndex.filter."""
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'min_level': 50},
+        {'max_level': 30},
+        {'min_level': 20, 'max_level': 60},
+        {'min_elite': 2},
+        {'max_elite': 0},
+        {'min_elite': 1, 'max_elite': 1, 'min_potential': 3},
+        {'min_potential': 5},
+        {'min_level': 0, 'max_level': 0},
+        {'min_level': 90, 'min_elite': 2, 'min_potential': 0},
+    ])
+    def test_matches_linear_scan(self, chars, kwargs):
+        """Test that indexed filtering returns exactly what a full scan does."""
+        index = RosterIndex(chars)
+
+        assert ids_of(index.filter(**kwargs)) == ids_of(linear_filter(chars, **kwargs))
+
+    def test_ids_follow_roster_order(self, chars):
+        """Test that results keep roster order regardless of id order."""
+        index = RosterIndex(chars)
+        wanted = [c['charId'] for c in list(chars.values())[:5]]
+
+        result = index.filter(ids=list(reversed(wanted)) + ['char_missing'])
+
+        assert [c['charId'] for c in result] == wanted
+
+    def test_ids_combined_with_ranges(self, chars):
+        """Test that small id selections are narrowed by range filters."""
+        index = RosterIndex(chars)
+        ids = [c['charId'] for c in list(chars.values())[:40]]
+
+        for kwargs in ({'min_elite': 2}, {'max_level': 40, 'min_potential': 1}):
+            assert ids_of(index.filter(ids=ids, **kwargs)) == ids_of(linear_filter(chars, ids=ids, **kwargs))
+            assert ids_of(index.filter(ids=ids[:3], **kwargs)) == ids_of(linear_filter(chars, ids=ids[:3], **kwargs))
+
+    def test_get_and_get_many(self, chars):
+        """Test by-id lookups return the same entries as the roster."""
+        index = RosterIndex(chars)
+        first, second = list(chars.values())[:2]
+
+        assert index.get(first['charId'])['level'] == first['level']
+        assert index.get('char_missing') is None
+        assert ids_of(index.get_many([second['charId'], 'char_missing', first['charId']])) == ids_of([second, first])
+
+    def test_entry_reads_like_raw_dict(self, chars):
+        """Test that a row view returns the raw values and defaults for absent keys."""
+        index = RosterIndex({
+            '1': {'charId': 'char_a', 'level': 30, 'skills': [{'unlock': 1}], 'gainTime': 123},
+            '2': {'charId': 'char_b'},
+        })
+        a, b = index.filter()
+
+        assert dict(a) == {'charId': 'char_a', 'level': 30, 'gainTime': 123, 'skills': [{'unlock': 1}]}
+        assert b.get('level', 0) == 0
+        assert b.get('gainTime') is None
+        assert b.get('defaultSkillIndex', -1) == -1
+        assert 'skills' not in b
+        with pytest.raises(KeyError):
+            b['skills']
+
+    def test_chars_view_round_trips(self, chars):
+        """Test that chars() reads back exactly like the source mapping."""
+        view = RosterIndex(chars).chars()
+
+        assert list(view) == list(chars)
+        assert {key: dict(entry) for key, entry in view.items()} == chars
+
+    def test_fixture_rows_need_no_extras(self, chars):
+        """Test that every key of a real roster entry has a column."""
+        index = RosterIndex(chars)
+
+        assert index.extras == [None] * len(chars)
+
+    def test_other_keys_and_values_are_kept(self):
+        """Test that unknown keys and non-int values of int keys are not lost."""
+        raw = {'9': {'charId': 'char_x', 'instId': 9, 'level': '30', 'mood': None, 'favorPoint': 2.5}}
+        entry = RosterIndex(raw).chars()['9']
+
+        assert dict(entry) == raw['9']
+        assert entry['level'] == '30'
+
+    def test_entries_have_no_instance_dict(self, chars):
+        """Test that row views are slotted."""
+        entry = RosterIndex(chars).filter()[0]
+
+        assert not hasattr(entry, '__dict__')
+
+    def test_empty_roster(self):
+        """Test that an empty roster yields no results."""
+        index = RosterIndex({})
+
+        assert len(index) == 0
+        assert index.filter(min_level=1) == []
+
+
+class TestFixtureStoreRoster:
+    """Tests for FixtureStore.roster()."""
+
+    def test_roster_is_rebuilt_after_reload(self, tmp_path):
+        """Test that a changed fixture file produces a fresh index."""
+        import os
+
+        path = tmp_path / 'fixture.json'
+
+        def write(chars, mtime):
+            path.write_text(json.dumps({'data': {'user': {'troop': {'chars': chars}}}}))
+            os.utime(path, ns=(mtime, mtime))
+
+        write({'1': {'charId': 'char_a', 'level': 10}}, 1_000_000_000)
+        store = FixtureStore(path)
+        first = store.roster()
+        assert store.roster() is first
+
+        write({'1': {'charId': 'char_b', 'level': 20}}, 2_000_000_000)
+        second = store.roster()
+
+        assert second is not first
+        assert ids_of(second.filter()) == ['char_b']
+        assert store.chars() is second.chars()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
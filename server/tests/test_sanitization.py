@@ -5,6 +5,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 import json
+import timeit
 import pytest
 from server.main import sanitize_sensitive_data, sanitize_headers
 
@@ -176,6 +177,74 @@ class TestSanitizeSensitiveData:
         assert result_data["yostar_token"] != "secret"
 
 
+class TestSanitizeFastPath:
+    """Tests for the single-pass redactor's edge cases."""
+
+    def test_text_without_sensitive_keys_is_returned_unchanged(self):
+        """Test that bodies without sensitive key names skip all work."""
+        text = json.dumps({"nickName": "Player123", "level": 107})
+
+        assert sanitize_sensitive_data(text) is text
+
+    def test_truncated_json_is_redacted(self):
+        """Test that a body cut mid-value still has its secret masked."""
+        text = json.dumps({"server": "en", "yostar_token": "supersecrettoken"})[:-8]
+
+        result = sanitize_sensitive_data(text)
+
+        assert "supersec" not in result
+        assert "yostar_token" in result
+
+    def test_non_string_values_are_redacted(self):
+        """Test that numeric sensitive values are masked too."""
+        result = sanitize_sensitive_data(json.dumps({"code": 123456, "level": 1}))
+
+        assert "123456" not in result
+        assert json.loads(result)["level"] == 1
+
+    def test_nested_sensitive_object_is_redacted(self):
+        """Test that an object under a sensitive key is masked as a whole."""
+        text = json.dumps({"auth": {"user": "alice", "session": "abc"}, "ok": True})
+
+        result_data = json.loads(sanitize_sensitive_data(text))
+
+        assert result_data["auth"] == "***REDACTED***"
+        assert result_data["ok"] is True
+
+    def test_single_quoted_keys_are_redacted(self):
+        """Test Python-repr style text."""
+        result = sanitize_sensitive_data("{'token': 'abc123', 'ok': 1}")
+
+        assert "abc123" not in result
+        assert "'ok': 1" in result
+
+
+class TestSanitizeBenchmark:
+    """Micro-benchmark keeping the sanitizer within a per-call budget."""
+
+    # Generous relative to typical timings (~10-20us) so slow CI machines pass
+    BUDGET_SECONDS = 100e-6
+
+    @staticmethod
+    def per_call(text, number=500):
+        return min(timeit.repeat(lambda: sanitize_sensitive_data(text), number=number, repeat=3)) / number
+
+    def test_roster_slice_within_budget(self):
+        """Test the 2000-char roster slice logged for /my/roster responses."""
+        fixture_path = Path(__file__).parent / 'user_data_response.json'
+        with open(fixture_path, 'r') as f:
+            chars = json.load(f)["data"]["user"]["troop"]["chars"]
+        text = json.dumps({"ok": True, "chars": chars})[:2000]
+
+        assert self.per_call(text) < self.BUDGET_SECONDS
+
+    def test_credential_request_within_budget(self):
+        """Test a typical /my/roster request body containing credentials."""
+        text = json.dumps({"channel_uid": "14821859648", "yostar_token": "secret", "server": "en"})
+
+        assert self.per_call(text) < self.BUDGET_SECONDS
+
+
 class TestSanitizeHeaders:
     """Tests for sanitize_headers function."""
     
@@ -0,0 +1,118 @@
+"""Tests for the prefix-indexed player search cache."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from server import ark_client
+from server.search_cache import SearchCache, normalize_nickname
+
+PLAYERS = [
+    {'id': '1', 'name': 'Amiya', 'level': 120},
+    {'id': '2', 'name': 'Amiyi', 'level': 90},
+    {'id': '3', 'name': 'Amber', 'level': 10},
+]
+
+
+class TestSearchCache:
+    """Tests for exact and prefix lookups."""
+
+    def test_normalize(self):
+        """Test whitespace collapsing and case folding."""
+        assert normalize_nickname('  Doctor   Kal ') == 'doctor kal'
+
+    def test_complete_result_answers_longer_queries(self):
+        """Test that an untruncated 'Am' result answers 'amiy' by filtering."""
+        cache = SearchCache()
+        cache.set('en', 'Am', 10, PLAYERS)
+
+        assert [p['id'] for p in cache.get('en', 'amiy', 10)] == ['1', '2']
+        assert [p['id'] for p in cache.get('en', 'AMB', 5)] == ['3']
+        assert cache.get('en', 'amiy', 1) == [PLAYERS[0]]
+        assert cache.prefix_hits == 3
+
+    def test_truncated_result_is_not_used_for_prefixes(self):
+        """Test that a result cut off by its limit only answers the same query."""
+        cache = SearchCache()
+        cache.set('en', 'Am', 3, PLAYERS)
+
+        assert cache.get('en', 'amiy', 3) is None
+        assert cache.get('en', 'am', 2) == PLAYERS[:2]
+        assert cache.get('en', 'am', 5) is None
+
+    def test_regions_are_separate(self):
+        """Test that results from one region don't answer another."""
+        cache = SearchCache()
+        cache.set('en', 'Am', 10, PLAYERS)
+
+        assert cache.get('jp', 'am', 10) is None
+
+    def test_nickname_numbers_are_exact_only(self):
+        """Test that 'name#1234' is not answered from a prefix result."""
+        cache = SearchCache()
+        cache.set('en', 'Am', 10, PLAYERS)
+
+        assert cache.get('en', 'Amiya#1234', 10) is None
+
+    def test_entries_expire(self, clock):
+        """Test the TTL."""
+        cache = SearchCache(ttl=10, clock=clock)
+        cache.set('en', 'Am', 10, PLAYERS)
+
+        clock.now = 11
+        assert cache.get('en', 'amiya', 10) is None
+
+
+class TestSearchPlayers:
+    """Tests for ark_client.search_players with the cache."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        with patch.object(ark_client, 'search_cache', SearchCache()):
+            yield
+
+    @patch('server.ark_client._make_client')
+    def test_typing_hits_upstream_once(self, mock_make_client):
+        """Test that successive prefixes of a query reuse the first result."""
+        mock_client = Mock()
+        mock_client.search_players = AsyncMock(return_value=[
+            SimpleNamespace(uid='1', nickname='Amiya', level=120),
+            SimpleNamespace(uid='3', nickname='Amber', level=10),
+        ])
+        mock_make_client.return_value = mock_client
+
+        async def run():
+            return [await ark_client.search_players(q, server='en', limit=10) for q in ('Am', 'Ami', 'Amiy', 'Amiya')]
+
+        results = asyncio.run(run())
+
+        assert mock_client.search_players.await_count == 1
+        assert [p['name'] for p in results[-1]] == ['Amiya']
+
+    @patch('server.ark_client._make_client')
+    def test_concurrent_identical_searches_share_a_call(self, mock_make_client):
+        """Test that searches in flight together are coalesced."""
+        async def slow_search(nickname, server=None, limit=None):
+            await asyncio.sleep(0.01)
+            return [SimpleNamespace(uid='1', nickname='Amiya', level=120)]
+
+        mock_client = Mock()
+        mock_client.search_players = AsyncMock(side_effect=slow_search)
+        mock_make_client.return_value = mock_client
+
+        async def run():
+            return await asyncio.gather(*(ark_client.search_players('Amiya', server='en') for _ in range(3)))
+
+        results = asyncio.run(run())
+
+        assert mock_client.search_players.await_count == 1
+        assert all(r == results[0] for r in results)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+"""Tests for the bundled operator avatar endpoint."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from server import static_avatars as static_mod
+from server.static_avatars import StaticAvatars
+from server.main import app
+
+client = TestClient(app)
+
+
+class TestOperatorAvatarEndpoint:
+    """Tests for /operator-avatars/{name}."""
+
+    def test_serves_bundled_png_with_immutable_caching(self):
+        """Test that a bundled avatar is returned with cache headers."""
+        response = client.get('/operator-avatars/char_002_amiya.png')
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'image/png'
+        assert 'immutable' in response.headers['cache-control']
+        assert response.headers['etag'].startswith('"')
+        assert response.content.startswith(b'\x89PNG')
+
+    def test_suffix_is_optional(self):
+        """Test that the char id alone resolves to the same file."""
+        with_suffix = client.get('/operator-avatars/char_002_amiya.png')
+        without_suffix = client.get('/operator-avatars/char_002_amiya')
+
+        assert without_suffix.status_code == 200
+        assert without_suffix.headers['etag'] == with_suffix.headers['etag']
+
+    def test_if_none_match_returns_304(self):
+        """Test conditional GET with a matching ETag."""
+        etag = client.get('/operator-avatars/char_002_amiya').headers['etag']
+
+        response = client.get('/operator-avatars/char_002_amiya', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.content == b''
+
+    @pytest.mark.parametrize('header', ['W/{etag}', '"other", {etag}', '*'])
+    def test_weak_list_and_wildcard_if_none_match(self, header):
+        """Test that weak tags, tag lists and '*' are honored like on the other endpoints."""
+        etag = client.get('/operator-avatars/char_002_amiya').headers['etag']
+
+        response = client.get('/operator-avatars/char_002_amiya', headers={'If-None-Match': header.format(etag=etag)})
+
+        assert response.status_code == 304
+
+    def test_unknown_or_traversal_names_are_404(self):
+        """Test that only indexed files can be served."""
+        assert client.get('/operator-avatars/char_does_not_exist').status_code == 404
+        assert client.get('/operator-avatars/..%2Fchars.json').status_code == 404
+
+    def test_webp_variant_preferred_when_accepted(self, tmp_path):
+        """Test Accept-based selection of a WebP sibling."""
+        (tmp_path / 'char_x.png').write_bytes(b'\x89PNG')
+        (tmp_path / 'char_x.webp').write_bytes(b'RIFFWEBP')
+
+        with patch.object(static_mod, 'static_avatars', StaticAvatars(str(tmp_path))):
+            webp = client.get('/operator-avatars/char_x', headers={'Accept': 'image/webp,image/*'})
+            png = client.get('/operator-avatars/char_x', headers={'Accept': 'image/png'})
+
+        assert webp.headers['content-type'] == 'image/webp'
+        assert png.headers['content-type'] == 'image/png'
+        assert webp.headers['etag'] != png.headers['etag']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])